@@ -1,41 +1,113 @@
 from __future__ import unicode_literals
 
+from bulk_admin.signals import bulk_view_timed
 from collections import OrderedDict
+from contextlib import contextmanager
 from django import forms
+from django.conf import settings
 from django.contrib import admin, messages
 from django.contrib.admin.exceptions import DisallowedModelAdminToField
 from django.contrib.admin.options import IS_POPUP_VAR, InlineModelAdmin, TO_FIELD_VAR, csrf_protect_m
 from django.contrib.admin.templatetags.admin_static import static
 from django.contrib.admin.templatetags.admin_urls import add_preserved_filters
 from django.contrib.admin.utils import NestedObjects, flatten_fieldsets
-from django.core.exceptions import PermissionDenied, ValidationError
+from django.contrib.admin.widgets import ForeignKeyRawIdWidget, ManyToManyRawIdWidget
+from django.core.cache import caches
+from django.core.exceptions import NON_FIELD_ERRORS, PermissionDenied, ValidationError
+from django.core.files.uploadedfile import UploadedFile
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.urlresolvers import reverse
-from django.db import router, transaction
+from django.db import DatabaseError, connections, router, transaction
+from django.db.models import AutoField, FileField, ForeignKey, ManyToManyField, Q
+from django.db.models.fields import FieldDoesNotExist
+from django.db.models.query import prefetch_related_objects
+from django.db.models.signals import m2m_changed
 from django.forms.formsets import DELETION_FIELD_NAME, INITIAL_FORM_COUNT, TOTAL_FORM_COUNT, ManagementForm
 from django.forms.models import modelform_defines_fields, modelformset_factory, BaseModelFormSet
 from django.forms.utils import ErrorList
-from django.http import HttpResponseRedirect
-from django.template.response import SimpleTemplateResponse
+from django.http import (
+    Http404, HttpResponse, HttpResponseBadRequest, HttpResponseNotAllowed, HttpResponseRedirect, JsonResponse, QueryDict, StreamingHttpResponse,
+)
+from django.template.response import SimpleTemplateResponse, TemplateResponse
 from django.utils import six
+from django.utils.datastructures import MultiValueDict
 from django.utils.encoding import force_text
+from django.utils.safestring import mark_safe
 from django.utils.text import get_text_list
-from django.utils.translation import ugettext as _, ugettext_lazy
-from functools import partial, update_wrapper
+from django.utils.translation import ugettext as _, ugettext_lazy, ungettext
+from functools import partial, reduce, update_wrapper
+from multiprocessing.pool import ThreadPool
 
+import codecs
+import copy
+import csv
 import django
+import itertools
+import json
+import logging
+import multiprocessing
+import operator
+import os
 import re
+import tempfile
+import threading
+import time
+import timeit
 import uuid
 
+try:
+    from django.db.models import Case, Value, When
+except ImportError:  # Django < 1.8
+    Case = Value = When = None
+
+
+logger = logging.getLogger(__name__)
 
 _RE_BULK_FILE = re.compile(r'^([^\\-]+)-([^\\-]+)$')
+_RE_BULK_UPLOAD_ID = re.compile(r'^[0-9a-f]{32}$')
+_SESSION_KEY_BULK_SELECTIONS = 'bulk_admin_selections'
+_BULK_JOB_PROGRESS_INTERVAL = 100
+_BULK_IMPORT_CONTENT_TYPES = {
+    'text/csv': 'csv',
+    'application/jsonl': 'jsonl',
+    'application/x-jsonlines': 'jsonl',
+    'application/x-ndjson': 'jsonl',
+}
 
 
 class BulkModelAdmin(admin.ModelAdmin):
 
     actions = ['bulk_edit_action']
+    bulk_commit_chunk_size = 500
+    bulk_commit_mode = None
+    bulk_export_chunk_size = 2000
     bulk_generate_unique_values = None
+    bulk_import_batch_size = 500
     bulk_inline = None
+    bulk_job_cache = 'default'
+    bulk_job_mode = None
+    bulk_job_timeout = 24 * 60 * 60
+    bulk_job_workers = 2
+    bulk_log_entries = True
+    bulk_lookup_batch_size = 500
+    bulk_render_batch_size = 100
+    bulk_render_mode = None
+    bulk_save_batch_size = 500
+    bulk_save_mode = None
+    bulk_selection_limit = 10
+    bulk_server_timing = False
+    bulk_submit_mode = None
+    bulk_update_fields = None
+    bulk_update_template = None
+    bulk_upload_chunk_size = None
+    bulk_upload_data_timeout = None
+    bulk_upload_data_workers = None
+    bulk_upload_expiry = 24 * 60 * 60
     bulk_upload_fields = None
+    bulk_upload_max_size = None
+    bulk_upload_parallel = 3
+    bulk_upload_storage_workers = None
+    bulk_window_size = None
     change_list_template = None
     add_form_template = None
     change_form_template = None
@@ -76,12 +148,41 @@ class BulkModelAdmin(admin.ModelAdmin):
 
         urlpatterns = super(BulkModelAdmin, self).get_urls()
         urlpatterns.insert(0, url(r'^bulk/$', wrap(self.bulk_view), name='%s_%s_bulk' % info))
+        urlpatterns.insert(1, url(r'^bulk/upload/$', wrap(self.bulk_upload_view), name='%s_%s_bulk_upload' % info))
+        urlpatterns.insert(2, url(r'^bulk/import/$', wrap(self.bulk_import_view), name='%s_%s_bulk_import' % info))
+        urlpatterns.insert(3, url(r'^bulk/jobs/([0-9a-f]{32})/$', wrap(self.bulk_job_view), name='%s_%s_bulk_job' % info))
 
         return urlpatterns
 
     @csrf_protect_m
-    @transaction.atomic
     def bulk_view(self, request, form_url='', extra_context=None):
+        using = router.db_for_write(self.model)
+        # Queries are only counted for someone to receive the timings
+        count_queries = self.bulk_server_timing or bulk_view_timed.has_listeners(self.__class__)
+        timings = BulkTimings(using, count_queries)
+
+        with timings.counting_queries():
+            if self.get_bulk_commit_mode(request):
+                # The forms are committed in chunks by commit_bulk_formset
+                response = self._bulk_view(request, form_url, extra_context, timings)
+            else:
+                with transaction.atomic(using=using):
+                    response = self._bulk_view(request, form_url, extra_context, timings)
+
+        if isinstance(response, SimpleTemplateResponse) and not response.is_rendered:
+            # The response is rendered after the view returned, the timings are recorded once it is
+            response.add_post_render_callback(partial(self._record_rendered_bulk_timings, request, timings, timeit.default_timer()))
+        else:
+            self.record_bulk_timings(request, response, timings)
+
+        return response
+
+    def _record_rendered_bulk_timings(self, request, timings, render_start, response):
+        rows = timings.phases['inline_formsets']['rows'] if 'inline_formsets' in timings.phases else 0
+        timings.add_phase('render', timeit.default_timer() - render_start, rows=rows)
+        self.record_bulk_timings(request, response, timings)
+
+    def _bulk_view(self, request, form_url, extra_context, timings):
         to_field = request.POST.get(TO_FIELD_VAR, request.GET.get(TO_FIELD_VAR))
         if to_field and not self.to_field_allowed(request, to_field):
             raise DisallowedModelAdminToField("The field %s cannot be referenced." % to_field)
@@ -92,20 +193,21 @@ class BulkModelAdmin(admin.ModelAdmin):
         continue_requested = request.POST.get('_continue', request.GET.get('_continue'))
         force_continue = False
         inline = self.get_bulk_inline(request)
-        formset_class = inline.get_formset(request)
+        formset_class = inline.get_formset(request, **({} if self.has_add_permission(request) else {'max_num': 0}))
         formset_params = {}
         prefix = formset_class.get_default_prefix()
         queryset = inline.get_queryset(request)
-
-        if not self.has_add_permission(request):
-            formset_class.max_num = 0
+        unchanged_pks = []
+        window_size = self.get_bulk_window_size(request)
+        windowed = bool(window_size) and ('selection' in request.GET or 'pks' in request.GET)
+        window_has_next = windowed
 
         if request.method == 'GET':
-            if 'pks' in request.GET and self.has_change_permission(request):
-                pks = [opts.pk.to_python(pk) for pk in request.GET.get('pks').split(',')]
-                queryset = queryset.filter(pk__in=pks)
-            else:
-                queryset = queryset.none()
+            queryset = self.get_bulk_queryset(request, queryset)
+            queryset = inline.apply_related_lookups(request, queryset, formset_class, self.get_bulk_related_lookups(request))
+
+            if windowed:
+                queryset, window_has_next = self.get_bulk_window(request, queryset, window_size)
 
         elif request.method == 'POST':
             management_form = ManagementForm(request.POST, prefix=prefix)
@@ -122,9 +224,16 @@ class BulkModelAdmin(admin.ModelAdmin):
             if not self.has_change_permission(request) and management_form.cleaned_data[INITIAL_FORM_COUNT] > 0:
                 raise PermissionDenied
 
-            queryset = self.transform_queryset(request, queryset, management_form, prefix)
+            with timings.phase('transform_queryset', rows=management_form.cleaned_data[INITIAL_FORM_COUNT]):
+                unchanged_pks = self.get_bulk_unchanged_pks(request, prefix)
+                queryset = self.transform_queryset(request, queryset, management_form, prefix)
+
+            with timings.phase('transform_post_and_files', rows=management_form.cleaned_data[TOTAL_FORM_COUNT]):
+                post, files, force_continue = self.transform_post_and_files(request, prefix)
+
+            if self.use_bulk_job(request):
+                return self.start_bulk_job(request, formset_class(data=post, queryset=queryset))
 
-            post, files, force_continue = self.transform_post_and_files(request, prefix)
             formset_params.update({
                 'data': post,
                 'files': files,
@@ -135,18 +244,61 @@ class BulkModelAdmin(admin.ModelAdmin):
         formset = formset_class(**formset_params)
 
         if request.method == 'POST':
-            if formset.is_valid():
-                self.save_formset(request, form=None, formset=formset, change=False)
+            commit_mode = self.get_bulk_commit_mode(request)
 
-                if continue_requested or force_continue:
+            with timings.phase('validate', rows=formset.total_form_count()):
+                valid = formset.is_valid()
+
+            with timings.phase('write_files', rows=formset.total_form_count()):
+                written_files = self.write_bulk_files(request, formset) if valid or commit_mode else []
+
+            # Failed writes are added as errors to their forms
+            valid = valid and formset.is_valid()
+
+            window_pks = [form.instance.pk for form in formset.initial_forms if form.instance.pk is not None] + unchanged_pks
+            window_end = max(window_pks) if window_pks else None
+
+            if commit_mode:
+                with timings.phase('save', rows=formset.total_form_count()):
+                    commit_report = self.commit_bulk_formset(request, formset)
+                    self.log_bulk_formset(request, formset)
+
+                saved = not commit_report['failed_rows'] and not formset.non_form_errors()
+
+                if not saved:
+                    failed_instances = set(id(formset.forms[index].instance) for index in commit_report['failed_rows'])
+                    self.delete_bulk_files(request, [field_file for field_file in written_files if id(field_file.instance) in failed_instances])
+                    self.message_user(request, self.get_bulk_commit_message(request, commit_report), messages.WARNING)
+                    formset = self.get_bulk_failed_formset(request, formset_class, formset, commit_report['failed_rows'])
+
+            elif valid:
+                try:
+                    with timings.phase('save', rows=formset.total_form_count()):
+                        self.save_bulk_formset(request, formset)
+                        self.log_bulk_formset(request, formset)
+                except Exception:
+                    self.delete_bulk_files(request, written_files)
+                    raise
+
+                saved = True
+
+            else:
+                self.delete_bulk_files(request, written_files)
+                saved = False
+
+            if saved:
+                if windowed and '_nextwindow' in request.POST:
+                    return self.response_bulk_window(request, formset, window_end)
+
+                elif continue_requested or force_continue:
                     # The implementation of ModelAdmin redirects to the change view if valid and continue was requested
                     # The change view then reads the edited model again from database
                     # In our case, we can't make a redirect as we would loose the information which models should be edited
                     # Thus, we create a new formset with the edited models and continue as this would have been a usual GET request
 
                     if self.has_change_permission(request):
-                        queryset = _ListQueryset(queryset)
-                        queryset.extend(formset.new_objects)
+                        queryset = _ListQueryset(self.get_bulk_saved_objects(request, formset))
+                        inline.apply_related_lookups(request, queryset, formset_class)
                     else:
                         queryset = _ListQueryset()
 
@@ -164,9 +316,18 @@ class BulkModelAdmin(admin.ModelAdmin):
                 else:
                     return self.response_bulk(request, formset)
 
+        rows = None
+
+        if not formset.is_bound and self.get_bulk_render_mode(request) == 'json':
+            # Ship the existing objects as data and let bulk.js build their rows from the empty form
+            rows = self.get_bulk_rows(request, formset)
+            formset = formset_class(**dict(formset_params, queryset=_ListQueryset()))
+
         media = self.media
 
-        inline_formsets = self.get_inline_formsets(request, [formset], [inline], obj=None)
+        with timings.phase('inline_formsets', rows=len(formset.forms)):
+            inline_formsets = self.get_inline_formsets(request, [formset], [inline], obj=None)
+
         for inline_formset in inline_formsets:
             media = media + inline_formset.media
 
@@ -181,7 +342,16 @@ class BulkModelAdmin(admin.ModelAdmin):
             self.admin_site.each_context(request) if django.VERSION >= (1, 8) else self.admin_site.each_context(),
             bulk=True,
             bulk_formset_prefix=prefix,
+            bulk_job_mode=self.get_bulk_job_mode(request),
             bulk_upload_fields=self.get_bulk_upload_fields(request),
+            bulk_upload_chunk_size=self.bulk_upload_chunk_size,
+            bulk_upload_parallel=self.bulk_upload_parallel,
+            bulk_window_size=window_size if windowed else None,
+            bulk_window_has_next=window_has_next,
+            bulk_shared_choices=getattr(formset, 'client_choices_json', None),
+            bulk_submit_mode=self.get_bulk_submit_mode(request) if not formset.is_bound else None,
+            bulk_unchanged_pks=','.join(force_text(pk) for pk in unchanged_pks) if formset.is_bound else None,
+            bulk_rows=_json_script(rows) if rows is not None else None,
             title=_('Bulk add %s') % force_text(opts.verbose_name_plural),
             is_popup=(IS_POPUP_VAR in request.POST or
                       IS_POPUP_VAR in request.GET),
@@ -194,7 +364,411 @@ class BulkModelAdmin(admin.ModelAdmin):
 
         context.update(extra_context or {})
 
-        return self.render_change_form(request, context, add=True, change=False, obj=None, form_url=form_url)
+        response = self.render_change_form(request, context, add=True, change=False, obj=None, form_url=form_url)
+
+        return response
+
+    def record_bulk_timings(self, request, response, timings):
+        """
+        Sends the bulk_view_timed signal with the timings of the phases of
+        bulk_view and adds them as Server-Timing header, if
+        bulk_server_timing is set.
+        """
+        bulk_view_timed.send(sender=self.__class__, request=request, response=response, timings=timings)
+
+        if self.bulk_server_timing:
+            response['Server-Timing'] = timings.server_timing()
+
+    def bulk_job_view(self, request, job_id):
+        """
+        Returns the progress of a bulk job as JSON. Once the job is done, the
+        URL to continue at is included, as it would have been redirected to
+        by bulk_view.
+        """
+        job = self.load_bulk_job(request, job_id)
+
+        if job is None or job['user'] != request.user.pk:
+            raise Http404
+
+        if job['status'] == 'done' and 'redirect_url' not in job:
+            job_request = copy.copy(request)
+            job_request.POST = QueryDict(job['response_data'])
+            job['redirect_url'] = self.response_bulk(job_request, None)['Location']
+            self.save_bulk_job(request, job_id, job)
+
+        return JsonResponse({name: value for name, value in six.iteritems(job) if name not in ('user', 'response_data')})
+
+    @csrf_protect_m
+    def bulk_upload_view(self, request):
+        """
+        Receives a single file in chunks of raw bytes and creates an object
+        for it, once the last chunk has arrived.
+
+        The query string contains the upload_id chosen by the client, the
+        field, the file name, the total size and the offset of the chunk.
+        A GET request returns the offset to resume a failed upload at. Once
+        all files are uploaded, the client posts their primary keys with
+        'finish' in the query string and gets a selection token to edit the
+        created objects with.
+        """
+        if not self.has_add_permission(request):
+            raise PermissionDenied
+
+        if request.method == 'POST' and 'finish' in request.GET:
+            return self.finish_bulk_upload(request)
+
+        upload_id = request.GET.get('upload_id', '')
+        field_name = request.GET.get('field')
+
+        if not _RE_BULK_UPLOAD_ID.match(upload_id):
+            return HttpResponseBadRequest('Invalid upload_id')
+
+        if field_name not in [field.name for field in self.get_bulk_upload_fields(request)]:
+            return HttpResponseBadRequest('Invalid field')
+
+        path = self.get_bulk_upload_temporary_path(request, upload_id)
+        offset = os.path.getsize(path) if os.path.exists(path) else 0
+
+        if request.method != 'POST':
+            return JsonResponse({'offset': offset})
+
+        try:
+            size = int(request.GET['size'])
+            chunk_offset = int(request.GET['offset'])
+            index = int(request.GET.get('index', 0))
+        except (KeyError, ValueError):
+            return HttpResponseBadRequest('Invalid size, offset or index')
+
+        if size < 0 or index < 0:
+            return HttpResponseBadRequest('Invalid size or index')
+
+        max_size = self.get_bulk_upload_max_size(request)
+
+        if max_size is not None and size > max_size:
+            return HttpResponse('The file is larger than {} bytes'.format(max_size), status=413)
+
+        if chunk_offset != offset:
+            # The client has to resume at the offset we already received
+            return JsonResponse({'offset': offset}, status=409)
+
+        if offset == 0:
+            self.delete_expired_bulk_uploads(request)
+
+        with open(path, 'ab') as destination:
+            while offset <= size:
+                chunk = request.read(64 * 1024)
+                if not chunk:
+                    break
+                destination.write(chunk)
+                offset += len(chunk)
+
+        if offset < size:
+            return JsonResponse({'offset': offset})
+
+        try:
+            if offset > size:
+                return HttpResponseBadRequest('Received more data than announced')
+
+            with open(path, 'rb') as data:
+                field_file = UploadedFile(data, name=request.GET.get('name', upload_id), size=size)
+                form = self.save_bulk_upload(request, field_name, field_file, index)
+        finally:
+            os.remove(path)
+
+        if form.errors:
+            return JsonResponse({'offset': offset, 'errors': form.errors}, status=400)
+
+        return JsonResponse({'offset': offset, 'pk': force_text(form.instance.pk)})
+
+    def finish_bulk_upload(self, request):
+        """
+        Stores the primary keys of the objects created by chunked uploads as
+        selection and returns its token, so that the client doesn't have to
+        put them into the URL.
+        """
+        to_python = self.model._meta.pk.to_python
+
+        try:
+            pks = [force_text(to_python(pk)) for pk in request.POST.getlist('pks')]
+        except ValidationError:
+            return HttpResponseBadRequest('Invalid pks')
+
+        return JsonResponse({'selection': self.save_bulk_selection(request, {'pks': pks})})
+
+    def delete_expired_bulk_uploads(self, request):
+        """
+        Removes the temporary files of chunked uploads, which weren't
+        continued for bulk_upload_expiry seconds.
+        """
+        expiry = self.get_bulk_upload_expiry(request)
+
+        if expiry is None:
+            return
+
+        directory = self.get_bulk_upload_temporary_directory(request)
+        expired = time.time() - expiry
+
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+
+            try:
+                if os.path.getmtime(path) < expired:
+                    os.remove(path)
+            except OSError:
+                # Completed or removed by a concurrent request
+                continue
+
+    def get_bulk_upload_expiry(self, request):
+        return self.bulk_upload_expiry
+
+    def get_bulk_upload_max_size(self, request):
+        return self.bulk_upload_max_size
+
+    @transaction.atomic
+    def save_bulk_upload(self, request, field_name, field_file, index):
+        """
+        Validates and saves an object for an uploaded file with the form of
+        the bulk inline and records its addition in the admin log. Returns
+        the form.
+        """
+        inline = self.get_bulk_inline(request)
+        form_class = inline.get_formset(request).form
+        data = self.generate_data_for_file(request, field_name, field_file, index) or {}
+        form = form_class(data=data, files={field_name: field_file})
+
+        if form.is_valid():
+            obj = form.save()
+
+            if self.bulk_log_entries:
+                self.log_addition(request, obj)
+
+        return form
+
+    @csrf_protect_m
+    def bulk_import_view(self, request):
+        """
+        Creates objects from a CSV body with a header row or a JSON Lines body.
+
+        The body is read as a stream and validated in batches of
+        bulk_import_batch_size rows with the formset of the bulk inline. A
+        batch is saved if all of its rows are valid. Returns the number of
+        created objects, the errors by row and the rows of the batches which
+        weren't saved.
+        """
+        if not self.has_add_permission(request):
+            raise PermissionDenied
+
+        if request.method != 'POST':
+            return HttpResponseNotAllowed(['POST'])
+
+        import_format = self.get_bulk_import_format(request)
+
+        if import_format is None:
+            return HttpResponseBadRequest('Invalid format')
+
+        formset_class = self.get_bulk_inline(request).get_formset(request)
+        rows = _iter_import_rows(request, import_format)
+        report = {
+            'created': 0,
+            'errors': [],
+            'failed_batches': [],
+        }
+
+        for batch in _iter_chunks(rows, self.get_bulk_import_batch_size(request)):
+            objects, errors, batch_errors = self.save_bulk_import_batch(request, formset_class, batch)
+
+            report['created'] += len(objects)
+            report['errors'].extend(errors)
+
+            if errors or batch_errors:
+                report['failed_batches'].append({
+                    'first_row': batch[0][0],
+                    'last_row': batch[-1][0],
+                    'errors': batch_errors,
+                })
+
+        return JsonResponse(report)
+
+    def save_bulk_import_batch(self, request, formset_class, rows):
+        """
+        Validates *rows*, a list of (row number, data, error) tuples, as new
+        forms of *formset_class* and saves them, if all of them are valid.
+        Returns the created objects, the errors by row and the errors
+        concerning the batch as a whole. Values of multiple choice fields
+        given as comma separated text, as in CSV exports, are split.
+        """
+        errors = [{'row': number, 'errors': {NON_FIELD_ERRORS: [error]}} for number, data, error in rows if error]
+
+        if errors:
+            return [], errors, []
+
+        prefix = formset_class.get_default_prefix()
+        data = {
+            '{}-{}'.format(prefix, TOTAL_FORM_COUNT): len(rows),
+            '{}-{}'.format(prefix, INITIAL_FORM_COUNT): 0,
+        }
+
+        # Raw id widgets split the text themselves
+        multiple_fields = set(
+            name for name, field in six.iteritems(formset_class.form.base_fields)
+            if isinstance(field, (forms.ModelMultipleChoiceField, forms.MultipleChoiceField)) and
+            not isinstance(getattr(field.widget, 'widget', field.widget), ManyToManyRawIdWidget)
+        )
+
+        for index, (number, row, error) in enumerate(rows):
+            for name, value in six.iteritems(row):
+                if name in multiple_fields and isinstance(value, six.string_types):
+                    value = [item for item in value.split(',') if item]
+                data['{}-{}-{}'.format(prefix, index, name)] = value
+
+        formset = formset_class(data=data, queryset=_ListQueryset())
+
+        if formset.is_valid():
+            with transaction.atomic(using=router.db_for_write(self.model)):
+                self.save_bulk_formset(request, formset)
+                self.log_bulk_formset(request, formset)
+            return formset.new_objects, [], []
+
+        for (number, row, error), form in zip(rows, formset.forms):
+            if form.errors:
+                errors.append({'row': number, 'errors': _error_messages(form.errors)})
+
+        return [], errors, _error_messages(formset.non_form_errors())
+
+    def get_bulk_import_format(self, request):
+        import_format = request.GET.get('format')
+
+        if import_format is None:
+            content_type = request.META.get('CONTENT_TYPE', '').split(';')[0].strip()
+            import_format = _BULK_IMPORT_CONTENT_TYPES.get(content_type)
+
+        return import_format if import_format in ('csv', 'jsonl') else None
+
+    def get_bulk_import_batch_size(self, request):
+        return self.bulk_import_batch_size
+
+    def get_bulk_upload_temporary_path(self, request, upload_id):
+        return os.path.join(self.get_bulk_upload_temporary_directory(request), '{}-{}'.format(request.user.pk, upload_id))
+
+    def get_bulk_upload_temporary_directory(self, request):
+        directory = os.path.join(settings.FILE_UPLOAD_TEMP_DIR or tempfile.gettempdir(), 'bulk_admin_uploads')
+
+        if not os.path.isdir(directory):
+            try:
+                os.makedirs(directory)
+            except OSError:
+                # Created by a concurrent request
+                pass
+
+        return directory
+
+    def use_bulk_job(self, request):
+        """
+        Returns whether a POST of bulk_view is validated and saved by a
+        background job. Only ajax requests without files are, which don't
+        continue editing, aren't popups and are committed at once.
+        """
+        if not self.get_bulk_job_mode(request) or not request.is_ajax() or request.FILES:
+            return False
+
+        if self.get_bulk_commit_mode(request):
+            # The failed rows of partial commits are shown within the request
+            return False
+
+        return not any(name in request.POST or name in request.GET for name in ('_continue', '_nextwindow', IS_POPUP_VAR))
+
+    def start_bulk_job(self, request, formset):
+        """
+        Stores a new bulk job for the bound *formset*, submits it and returns
+        the URL to poll its progress at.
+        """
+        opts = self.model._meta
+        job_id = uuid.uuid4().hex
+        response_data = QueryDict('', mutable=True)
+
+        if '_addanother' in request.POST:
+            response_data['_addanother'] = request.POST['_addanother']
+
+        self.save_bulk_job(request, job_id, {
+            'user': request.user.pk,
+            'status': 'queued',
+            'total': formset.total_form_count(),
+            'processed': 0,
+            'errors': [],
+            'non_form_errors': [],
+            'response_data': response_data.urlencode(),
+        })
+
+        self.submit_bulk_job(request, partial(self.run_bulk_job, request, job_id, formset))
+
+        status_url = reverse('admin:%s_%s_bulk_job' % (opts.app_label, opts.model_name), args=[job_id], current_app=self.admin_site.name)
+
+        return JsonResponse({'job': job_id, 'status_url': status_url}, status=202)
+
+    def submit_bulk_job(self, request, job):
+        """
+        Runs the callable *job* in a pool of bulk_job_workers threads. Override
+        to hand it to another executor.
+        """
+        _get_bulk_job_pool(self.bulk_job_workers).apply_async(_call_closing_connections, (job,))
+
+    def run_bulk_job(self, request, job_id, formset):
+        """
+        Validates and saves *formset*, storing the progress of the job and
+        the errors by row. Jobs which expired or were evicted from the cache
+        before they started are skipped, as their progress can't be reported.
+        """
+        job = self.load_bulk_job(request, job_id)
+
+        if job is None:
+            logger.warning('Bulk job %s was not found', job_id)
+            return
+
+        try:
+            job['status'] = 'validating'
+            self.save_bulk_job(request, job_id, job)
+
+            for index, form in enumerate(formset.forms, 1):
+                form.is_valid()
+                if index % _BULK_JOB_PROGRESS_INTERVAL == 0:
+                    job['processed'] = index
+                    self.save_bulk_job(request, job_id, job)
+
+            job['processed'] = len(formset.forms)
+
+            if not formset.is_valid():
+                job['status'] = 'invalid'
+                job['errors'] = [
+                    {'row': index, 'errors': _error_messages(form.errors)}
+                    for index, form in enumerate(formset.forms) if form.errors
+                ]
+                job['non_form_errors'] = _error_messages(formset.non_form_errors())
+                return
+
+            job['status'] = 'saving'
+            self.save_bulk_job(request, job_id, job)
+
+            with transaction.atomic(using=router.db_for_write(self.model)):
+                self.save_bulk_formset(request, formset)
+                self.log_bulk_formset(request, formset)
+
+            job['status'] = 'done'
+
+        except Exception:
+            logger.exception('Bulk job %s failed', job_id)
+            job['status'] = 'failed'
+
+        finally:
+            self.save_bulk_job(request, job_id, job)
+
+    def get_bulk_job_mode(self, request):
+        return self.bulk_job_mode
+
+    def save_bulk_job(self, request, job_id, job):
+        caches[self.bulk_job_cache].set('bulk_admin_job_{}'.format(job_id), job, self.bulk_job_timeout)
+
+    def load_bulk_job(self, request, job_id):
+        return caches[self.bulk_job_cache].get('bulk_admin_job_{}'.format(job_id))
 
     def response_bulk(self, request, formset):
         model = self.model
@@ -206,7 +780,7 @@ class BulkModelAdmin(admin.ModelAdmin):
         }
 
         if IS_POPUP_VAR in request.POST:
-            return self.response_bulk_popup(request, list(formset.queryset) + formset.new_objects)
+            return self.response_bulk_popup(request, self.get_bulk_saved_objects(request, formset))
 
         elif '_addanother' in request.POST:
             msg = _('The %(name_plural)s were bulk added successfully. You may add another %(name)s below.') % msg_dict
@@ -221,6 +795,26 @@ class BulkModelAdmin(admin.ModelAdmin):
 
             return self.response_post_save_add(request, obj=None)
 
+    def response_bulk_window(self, request, formset, window_end):
+        opts = self.model._meta
+        queryset = self.get_bulk_queryset(request, self.get_bulk_inline(request).get_queryset(request))
+
+        if isinstance(queryset, list):
+            has_next = any(obj.pk > window_end for obj in queryset) if window_end is not None else False
+        else:
+            has_next = window_end is not None and queryset.filter(pk__gt=window_end).exists()
+
+        if not has_next:
+            return self.response_bulk(request, formset)
+
+        msg = _('The %s were changed successfully. You may edit the next ones below.') % (force_text(opts.verbose_name_plural),)
+        self.message_user(request, msg, messages.SUCCESS)
+
+        query = request.GET.copy()
+        query['after'] = force_text(window_end)
+
+        return HttpResponseRedirect('{}?{}'.format(request.path, query.urlencode(safe=',')))
+
     def response_bulk_popup(self, request, objects):
         model = self.model
         opts = model._meta
@@ -238,45 +832,577 @@ class BulkModelAdmin(admin.ModelAdmin):
             'media': media,
         })
 
+    def get_bulk_saved_objects(self, request, formset):
+        """
+        Returns the objects of the saved *formset*, which weren't deleted, and
+        the objects left unchanged by bulk.js. The saved objects are taken
+        from the formset instead of being queried again. The relations of
+        get_bulk_related_lookups are loaded for all objects at once.
+        """
+        deleted = set(id(obj) for obj in formset.deleted_objects)
+        objects = [form.instance for form in formset.initial_forms if id(form.instance) not in deleted]
+        unchanged_pks = self.get_bulk_unchanged_pks(request, formset.prefix)
+
+        if unchanged_pks:
+            objects.extend(self.get_bulk_objects(request, self.get_bulk_inline(request).get_queryset(request), unchanged_pks))
+
+        objects.extend(formset.new_objects)
+
+        _prefetch_related(objects, self.get_bulk_related_lookups(request))
+
+        return objects
+
+    def get_bulk_related_lookups(self, request):
+        """
+        Returns the relations to load for the string representations of the
+        saved objects, by default the ones of list_select_related.
+        """
+        if self.list_select_related is True:
+            return [field.name for field in self.model._meta.concrete_fields if field.rel and not field.null]
+
+        return list(self.list_select_related or [])
+
+    def save_bulk_formset(self, request, formset):
+        if self.get_bulk_save_mode(request) == 'batched':
+            self.save_formset_batched(request, formset)
+        else:
+            self.save_formset(request, form=None, formset=formset, change=False)
+
+    def save_formset_batched(self, request, formset):
+        """
+        Persists the formset with bulk_create and batched updates instead of
+        saving every form on its own. Model save() is not called and no
+        pre_save/post_save signals are sent.
+        """
+        model = self.model
+        opts = model._meta
+        batch_size = self.get_bulk_save_batch_size(request)
+        queryset = model._default_manager.using(router.db_for_write(model))
+
+        formset.save(commit=False)
+
+        for obj in formset.deleted_objects:
+            obj.delete()
+
+        if formset.new_objects:
+            if _bulk_create_sets_pk(queryset.db, model) or not self.get_bulk_pks_needed(request, formset):
+                queryset.bulk_create(formset.new_objects, batch_size=batch_size)
+            else:
+                # The backend can't tell us the primary keys of bulk inserted rows,
+                # but they are needed for many to many relations, the admin log and
+                # the continue flow.
+                for obj in formset.new_objects:
+                    obj.save()
+
+        changed_fields = set()
+        for obj, changed_data in formset.changed_objects:
+            changed_fields.update(changed_data)
+
+        fields = [field for field in opts.concrete_fields if field.name in changed_fields and not field.primary_key]
+
+        if fields:
+            changed_objects = [obj for obj, changed_data in formset.changed_objects]
+
+            for obj in changed_objects:
+                for field in fields:
+                    setattr(obj, field.attname, field.pre_save(obj, False))
+
+            _bulk_update(queryset, changed_objects, fields, batch_size)
+
+        self.save_bulk_m2m(request, formset)
+
+    def get_bulk_pks_needed(self, request, formset):
+        """
+        Returns whether the primary keys of the new objects of *formset* are
+        needed after saving it: for the admin log, the many to many fields of
+        the forms, a popup or to continue editing the saved objects. If not,
+        new objects are bulk inserted even if the database backend doesn't
+        return their primary keys.
+        """
+        opts = self.model._meta
+        private_fields = getattr(opts, 'private_fields', getattr(opts, 'virtual_fields', []))
+
+        if self.bulk_log_entries:
+            return True
+
+        if any(field.name in formset.form.base_fields for field in itertools.chain(opts.many_to_many, private_fields)):
+            return True
+
+        if '_continue' in request.POST or '_continue' in request.GET or IS_POPUP_VAR in request.POST:
+            return True
+
+        # Bulk uploads continue editing the new objects, if data was generated for them
+        return any(_RE_BULK_FILE.match(name) for name in request.FILES)
+
+    def save_bulk_m2m(self, request, formset):
+        """
+        Saves the many to many fields of the saved forms of *formset* at once:
+        The current links of all changed objects are read with one query, the
+        removed links are deleted and the added ones are inserted with one
+        query per batch of bulk_save_batch_size. m2m_changed is sent once per
+        object and action. Fields with custom through models or symmetrical
+        relations are saved by their form field as usual.
+        """
+        opts = self.model._meta
+        private_fields = getattr(opts, 'private_fields', getattr(opts, 'virtual_fields', []))
+        new_objects = set(id(obj) for obj in formset.new_objects)
+        values_by_field = OrderedDict()
+
+        for form in formset.saved_forms:
+            fields = form._meta.fields
+            exclude = form._meta.exclude
+
+            for field in itertools.chain(opts.many_to_many, private_fields):
+                if not hasattr(field, 'save_form_data') or field.name not in form.cleaned_data:
+                    continue
+                if fields and field.name not in fields:
+                    continue
+                if exclude and field.name in exclude:
+                    continue
+
+                if isinstance(field, ManyToManyField) and _bulk_m2m_supported(field):
+                    values_by_field.setdefault(field, []).append((form.instance, form.cleaned_data[field.name], id(form.instance) in new_objects))
+                else:
+                    field.save_form_data(form.instance, form.cleaned_data[field.name])
+
+        using = router.db_for_write(self.model)
+        batch_size = self.get_bulk_save_batch_size(request)
+
+        for field, values in six.iteritems(values_by_field):
+            _bulk_set_m2m(field, values, using, batch_size)
+
+    def commit_bulk_formset(self, request, formset):
+        """
+        Saves the valid forms of *formset* in transactions of
+        bulk_commit_chunk_size forms. With bulk_commit_mode 'rows', every form
+        is saved within a savepoint, so a failing form doesn't roll back the
+        others of its chunk. Forms which couldn't be saved get the database
+        error, errors of the formset as a whole fail all forms. Returns the
+        committed rows of each chunk and the failed rows by index.
+        """
+        using = router.db_for_write(self.model)
+        commit_mode = self.get_bulk_commit_mode(request)
+        failed = set(index for index, form in enumerate(formset.forms) if form.errors)
+        report = {'committed_chunks': [], 'failed_rows': []}
+
+        # Errors of the formset as a whole fail all of its rows
+        if formset.non_form_errors():
+            failed.update(range(len(formset.forms)))
+
+        formset.new_objects = []
+        formset.changed_objects = []
+        formset.deleted_objects = []
+
+        valid_indexes = [index for index in range(len(formset.forms)) if index not in failed]
+
+        for chunk in _chunked(valid_indexes, self.get_bulk_commit_chunk_size(request)):
+            saved_formsets = []
+
+            try:
+                with transaction.atomic(using=using):
+                    if commit_mode == 'rows':
+                        for index in chunk:
+                            try:
+                                with transaction.atomic(using=using):
+                                    saved_formsets.append(self.save_bulk_forms(request, formset, [index]))
+                            except (DatabaseError, ValidationError) as e:
+                                formset.forms[index].add_error(None, _bulk_commit_error(_('The row could not be saved: %(error)s'), e))
+                                failed.add(index)
+                    else:
+                        saved_formsets.append(self.save_bulk_forms(request, formset, chunk))
+
+            except (DatabaseError, ValidationError) as e:
+                for index in chunk:
+                    formset.forms[index].add_error(None, _bulk_commit_error(_('This row was rolled back with its chunk: %(error)s'), e))
+                    failed.add(index)
+                continue
+
+            for saved_formset in saved_formsets:
+                formset.new_objects.extend(saved_formset.new_objects)
+                formset.changed_objects.extend(saved_formset.changed_objects)
+                formset.deleted_objects.extend(saved_formset.deleted_objects)
+
+            committed = [index for index in chunk if index not in failed]
+            if committed:
+                report['committed_chunks'].append(committed)
+
+        report['failed_rows'] = sorted(failed)
+
+        return report
+
+    def save_bulk_forms(self, request, formset, indexes):
+        """
+        Saves the forms of *formset* at *indexes* with save_bulk_formset and
+        returns the formset they were saved with.
+        """
+        subset = _formset_subset(formset, indexes)
+        self.save_bulk_formset(request, subset)
+        return subset
+
+    def get_bulk_commit_message(self, request, report):
+        committed = []
+        rows = sorted(itertools.chain.from_iterable(report['committed_chunks']))
+
+        # Only consecutive rows are merged into ranges
+        for key, group in itertools.groupby(enumerate(rows), lambda item: item[1] - item[0]):
+            group = [index for position, index in group]
+            first, last = group[0], group[-1]
+            committed.append(force_text(first + 1) if first == last else '{}-{}'.format(first + 1, last + 1))
+
+        return _('Committed rows: %(committed)s. Failed rows: %(failed)s. The failed rows are shown below.') % {
+            'committed': ', '.join(committed) or '-',
+            'failed': ', '.join(force_text(index + 1) for index in report['failed_rows']),
+        }
+
+    def get_bulk_failed_formset(self, request, formset_class, formset, failed_rows):
+        """
+        Returns a bound formset of the forms of *formset* at the indexes
+        *failed_rows* only, so that they can be corrected and submitted again
+        without the committed rows.
+        """
+        prefix = formset.prefix
+        pattern = re.compile(r'^{}-(\d+)-(.+)$'.format(re.escape(prefix)))
+        index_map = {old_index: index for index, old_index in enumerate(failed_rows)}
+        failed_forms = [formset.forms[index] for index in failed_rows]
+        initial_forms = [formset.forms[index] for index in failed_rows if index < formset.initial_form_count()]
+        data = QueryDict('', mutable=True)
+        files = MultiValueDict()
+
+        for source, target in ((formset.data, data), (formset.files, files)):
+            for key in source:
+                match = pattern.match(key)
+                if match and int(match.group(1)) in index_map:
+                    target.setlist('{}-{}-{}'.format(prefix, index_map[int(match.group(1))], match.group(2)), source.getlist(key))
+
+        data['{}-{}'.format(prefix, TOTAL_FORM_COUNT)] = len(failed_forms)
+        data['{}-{}'.format(prefix, INITIAL_FORM_COUNT)] = len(initial_forms)
+
+        failed_formset = formset_class(data=data, files=files, queryset=_ListQueryset(form.instance for form in initial_forms))
+        failed_formset.is_valid()
+
+        for form, failed_form in zip(failed_formset.forms, failed_forms):
+            for error in failed_form.errors.get(NON_FIELD_ERRORS, ErrorList()).as_data():
+                if error.code == 'commit_error':
+                    form.add_error(None, error)
+
+        return failed_formset
+
+    def log_bulk_formset(self, request, formset):
+        """
+        Records the additions, changes and deletions of the saved *formset*
+        in the admin log, with a single insert for all of them.
+        """
+        if not self.bulk_log_entries:
+            return
+
+        from django.contrib.admin.models import ADDITION, CHANGE, DELETION, LogEntry
+        from django.contrib.contenttypes.models import ContentType
+
+        content_type = ContentType.objects.get_for_model(self.model, for_concrete_model=False)
+        new_objects = set(id(obj) for obj in formset.new_objects)
+        changed_objects = set(id(obj) for obj, changed_data in formset.changed_objects)
+        deleted_objects = set(id(obj) for obj in formset.deleted_objects)
+        entries = []
+
+        for form in formset.forms:
+            obj = form.instance
+
+            if id(obj) in new_objects:
+                action_flag, change_message = ADDITION, ''
+            elif id(obj) in changed_objects:
+                action_flag, change_message = CHANGE, self.construct_change_message(request, form, None)
+            elif id(obj) in deleted_objects:
+                action_flag, change_message = DELETION, ''
+            else:
+                continue
+
+            entries.append(LogEntry(
+                user_id=request.user.pk,
+                content_type_id=content_type.pk,
+                object_id=force_text(_form_object_id(form)),
+                object_repr=force_text(obj)[:200],
+                action_flag=action_flag,
+                change_message=change_message,
+            ))
+
+        if entries:
+            LogEntry.objects.bulk_create(entries)
+
+    def write_bulk_files(self, request, formset):
+        """
+        Writes the uncommitted files of all forms to storage with a pool of
+        bulk_upload_storage_workers threads, before the objects are saved.
+        Failed writes are added as errors to their forms. Returns the written
+        files, so they can be deleted if the objects aren't saved.
+        """
+        workers = self.get_bulk_upload_storage_workers(request)
+
+        if not workers:
+            return []
+
+        tasks = []
+        for form in formset.forms:
+            if form.errors or not form.has_changed() or (formset.can_delete and formset._should_delete_form(form)):
+                continue
+
+            for field in form.instance._meta.concrete_fields:
+                if isinstance(field, FileField) and field.name in form.cleaned_data:
+                    field_file = getattr(form.instance, field.attname)
+                    if field_file and not field_file._committed:
+                        tasks.append((form, field, field_file))
+
+        if not tasks:
+            return []
+
+        pool = ThreadPool(min(workers, len(tasks)))
+        try:
+            results = pool.map(_write_field_file, [field_file for form, field, field_file in tasks])
+        finally:
+            pool.close()
+            pool.join()
+
+        written_files = []
+        for (form, field, field_file), error in zip(tasks, results):
+            if error is None:
+                written_files.append(field_file)
+            else:
+                form.add_error(field.name, ValidationError(
+                    _('The file could not be saved: %(error)s'),
+                    code='storage_error',
+                    params={'error': error},
+                ))
+
+        return written_files
+
+    def delete_bulk_files(self, request, field_files):
+        for field_file in field_files:
+            field_file.storage.delete(field_file.name)
+
+    def get_bulk_upload_storage_workers(self, request):
+        return self.bulk_upload_storage_workers
+
+    def get_bulk_commit_mode(self, request):
+        return self.bulk_commit_mode
+
+    def get_bulk_commit_chunk_size(self, request):
+        return self.bulk_commit_chunk_size
+
+    def get_bulk_save_mode(self, request):
+        return self.bulk_save_mode
+
+    def get_bulk_save_batch_size(self, request):
+        return self.bulk_save_batch_size
+
+    def get_bulk_render_batch_size(self, request):
+        return self.bulk_render_batch_size
+
+    def get_bulk_render_mode(self, request):
+        return self.bulk_render_mode
+
+    def get_bulk_submit_mode(self, request):
+        return self.bulk_submit_mode
+
+    def get_bulk_unchanged_pks(self, request, prefix):
+        """
+        Returns the primary keys of the objects, which were edited on the page
+        but not submitted by bulk.js as none of their fields changed.
+        """
+        unchanged = request.POST.get('{}-UNCHANGED'.format(prefix))
+
+        if not unchanged or not self.has_change_permission(request):
+            return []
+
+        to_python = self.model._meta.pk.to_python
+        pks = []
+
+        for pk in unchanged.split(','):
+            try:
+                pks.append(to_python(pk))
+            except ValidationError:
+                continue
+
+        return pks
+
+    def get_bulk_rows(self, request, formset):
+        """
+        Returns the values of the initial forms of *formset* as compact data
+        for bulk.js, which builds a row of the empty form for each of them.
+        Fields with multi widgets, like AdminSplitDateTime, have a value for
+        each of their subwidgets.
+        """
+        empty_form = formset.empty_form
+        fields = [name for name in empty_form.fields if name != DELETION_FIELD_NAME]
+        rows = []
+
+        for form in formset.initial_forms:
+            rows.append([force_text(form.instance)] + [value for name in fields for suffix, value in _widget_values(form[name])])
+
+        return {
+            'prefix': formset.prefix,
+            'fields': [name + suffix for name in fields for suffix, value in _widget_values(empty_form[name])],
+            'rows': rows,
+            'can_delete': formset.can_delete,
+            'batch_size': self.get_bulk_render_batch_size(request),
+        }
+
+    def get_bulk_queryset(self, request, queryset):
+        """
+        Returns the objects to bulk edit, as selected by the query string.
+        """
+        opts = self.model._meta
+
+        if 'selection' in request.GET and self.has_change_permission(request):
+            return self.get_bulk_selection_queryset(request, queryset, request.GET.get('selection'))
+        elif 'pks' in request.GET and self.has_change_permission(request):
+            pks = [opts.pk.to_python(pk) for pk in request.GET.get('pks').split(',')]
+            return self._get_bulk_pks_queryset(request, queryset, pks)
+        else:
+            return queryset.none()
+
+    def get_bulk_window_size(self, request):
+        return self.bulk_window_size
+
+    def get_bulk_window(self, request, queryset, window_size):
+        """
+        Returns the objects of the window following the primary key given by
+        the 'after' parameter and whether there are more objects after them.
+        """
+        after = self.model._meta.pk.to_python(request.GET.get('after')) if request.GET.get('after') else None
+
+        if isinstance(queryset, list):
+            # Large selections are already looked up in batches
+            objects = sorted((obj for obj in queryset if after is None or obj.pk > after), key=lambda obj: obj.pk)
+            objects = objects[:window_size + 1]
+        else:
+            queryset = queryset.order_by('pk')
+
+            if after is not None:
+                queryset = queryset.filter(pk__gt=after)
+
+            objects = list(queryset[:window_size + 1])
+
+        return _ListQueryset(objects[:window_size]), len(objects) > window_size
+
     def transform_queryset(self, request, queryset, management_form, prefix):
-        pk_list = []
-        pk_name = self.model._meta.pk.name
         pk_field = self.model._meta.pk
         to_python = pk_field.to_python
+        pk_key = '{}-{{}}-{}'.format(prefix, pk_field.name)
+        post = request.POST
 
-        for index in range(management_form.cleaned_data[INITIAL_FORM_COUNT]):
-            pk_key = '{}-{}-{}'.format(prefix, index, pk_name)
-            pk = request.POST[pk_key]
-            pk = to_python(pk)
-            pk_list.append(pk)
+        pk_list = [to_python(post[pk_key.format(index)]) for index in range(management_form.cleaned_data[INITIAL_FORM_COUNT])]
 
-        return queryset.filter(pk__in=pk_list)
+        return self.get_bulk_objects(request, queryset, pk_list)
+
+    def get_bulk_objects(self, request, queryset, pk_list):
+        """
+        Returns the objects of *queryset* with the primary keys of *pk_list*
+        in the order of *pk_list*. The objects are looked up in batches of
+        bulk_lookup_batch_size primary keys, which keeps the IN clauses below
+        the parameter limits of the database backends (e.g. 999 for SQLite).
+        """
+        pk_list = list(OrderedDict.fromkeys(pk_list))
+        objects = {}
+
+        for batch in _chunked(pk_list, self.get_bulk_lookup_batch_size(request)):
+            objects.update((obj.pk, obj) for obj in queryset.filter(pk__in=batch))
+
+        return _ListQueryset(objects[pk] for pk in pk_list if pk in objects)
+
+    def get_bulk_lookup_batch_size(self, request):
+        return self.bulk_lookup_batch_size
 
     def transform_post_and_files(self, request, prefix):
-        post = request.POST.copy()
-        files = request.FILES
+        """
+        Returns the POST data and files of the bulk formset, with the files
+        of bulk uploads assigned to one form each, the data generated for
+        them and whether to continue editing. The generated data and the
+        reindexed files are layered over request.POST and request.FILES
+        instead of copying them. Files whose data timed out are left out and
+        their forms are marked with a PENDING_FILE field, so that they fail
+        validation.
+        """
+        post = {}
+        files = {}
         force_continue = False
 
-        for field_name_prefixed, field_files in list(files.lists()):
+        for field_name_prefixed, field_files in list(request.FILES.lists()):
             match = _RE_BULK_FILE.match(field_name_prefixed)
 
             if match and match.group(1) == prefix:
                 field_name = match.group(2)
+                uploaded_files = [(field_name, field_file, index) for index, field_file in enumerate(field_files)]
 
-                for index, field_file in enumerate(field_files):
-                    files['{}-{}-{}'.format(prefix, index, field_name)] = field_file
+                for (field_name, field_file, index), form_data_for_file in zip(uploaded_files, self.generate_data_for_files(request, uploaded_files)):
+                    if form_data_for_file is None:
+                        post['{}-{}-PENDING_FILE'.format(prefix, index)] = [field_file.name]
+                        continue
 
-                    form_data_for_file = self.generate_data_for_file(request, field_name, field_file, index)
+                    files['{}-{}-{}'.format(prefix, index, field_name)] = [field_file]
 
                     if form_data_for_file:
                         force_continue = True
-                        post.update({
-                            '{}-{}-{}'.format(prefix, index, name): value
-                            for name, value
-                            in six.iteritems(form_data_for_file)
-                        })
 
-        return post, files, force_continue
+                        for name, value in six.iteritems(form_data_for_file):
+                            post.setdefault('{}-{}-{}'.format(prefix, index, name), []).append(value)
+
+        if not post and not files:
+            return request.POST, request.FILES, force_continue
+
+        return _OverlayDict(request.POST, post), _OverlayDict(request.FILES, files), force_continue
+
+    def generate_data_for_files(self, request, uploaded_files):
+        """
+        Returns the data of generate_data_for_file for every (field name, file,
+        index) of *uploaded_files*, in their order. With
+        bulk_upload_data_workers, the data is generated by a pool of that many
+        threads. Files whose data isn't generated within
+        bulk_upload_data_timeout seconds of a thread picking them up get None
+        instead, as their threads may still be reading them.
+        """
+        workers = self.get_bulk_upload_data_workers(request)
+
+        if not workers or len(uploaded_files) < 2:
+            return [self.generate_data_for_file(request, field_name, field_file, index) for field_name, field_file, index in uploaded_files]
+
+        timeout = self.get_bulk_upload_data_timeout(request)
+        pool = ThreadPool(min(workers, len(uploaded_files)))
+        starts = [_TaskStart() for uploaded_file in uploaded_files]
+        timed_out = False
+        data = []
+
+        try:
+            results = [
+                pool.apply_async(start, (self.generate_data_for_file, request, field_name, field_file, index))
+                for (field_name, field_file, index), start in zip(uploaded_files, starts)
+            ]
+
+            for (field_name, field_file, index), start, result in zip(uploaded_files, starts, results):
+                if timeout is None:
+                    data.append(result.get())
+                    continue
+
+                # Files queued behind the others don't use up their time while waiting for a thread
+                start.event.wait()
+
+                try:
+                    data.append(result.get(max(0, start.time + timeout - timeit.default_timer())))
+                except multiprocessing.TimeoutError:
+                    logger.warning('Generating the data for file %s timed out', field_file.name)
+                    timed_out = True
+                    data.append(None)
+        finally:
+            pool.close()
+            # Timed out threads can't be stopped, they end on their own
+            if not timed_out:
+                pool.join()
+
+        return data
+
+    def get_bulk_upload_data_workers(self, request):
+        return self.bulk_upload_data_workers
+
+    def get_bulk_upload_data_timeout(self, request):
+        return self.bulk_upload_data_timeout
 
     def generate_data_for_file(self, request, field_name, field_file, index):
         return {field: uuid.uuid4() for field in self.get_bulk_generate_unique_values() or []}
@@ -325,17 +1451,604 @@ class BulkModelAdmin(admin.ModelAdmin):
         model = self.model
         opts = model._meta
 
-        selected = request.POST.getlist(admin.ACTION_CHECKBOX_NAME)
+        if request.POST.get('select_across') == '1':
+            # Store the changelist filters instead of every matching primary key
+            selection = {'filters': request.GET.urlencode()}
+        else:
+            selection = {'pks': request.POST.getlist(admin.ACTION_CHECKBOX_NAME)}
+
+        token = self.save_bulk_selection(request, selection)
         redirect_url = reverse('admin:%s_%s_bulk' % (opts.app_label, opts.model_name), current_app=self.admin_site.name)
 
-        return HttpResponseRedirect('{}?pks={}'.format(redirect_url, ','.join(selected)))
+        return HttpResponseRedirect('{}?selection={}'.format(redirect_url, token))
 
     bulk_edit_action.short_description = ugettext_lazy('Bulk edit')
 
+    def bulk_update_action(self, request, queryset):
+        """
+        Shows a single form with the fields of get_bulk_update_fields and sets
+        the chosen fields of all selected objects to its values, without a
+        form per object.
+        """
+        if not self.has_change_permission(request):
+            raise PermissionDenied
+
+        opts = self.model._meta
+        form_class = self.get_bulk_update_form(request)
+        chosen = [name for name in request.POST.getlist('_bulk_update_fields') if name in form_class.base_fields]
+
+        if '_bulk_update' in request.POST:
+            form = form_class(request.POST, request.FILES, prefix='bulk_update')
+
+            for name, field in six.iteritems(form.fields):
+                if name not in chosen:
+                    field.required = False
+
+            form.is_valid()
+
+            for name in list(form.errors):
+                if name not in chosen and name != NON_FIELD_ERRORS:
+                    del form.errors[name]
+
+            if not chosen:
+                self.message_user(request, _('Choose the fields to update.'), messages.WARNING)
+
+            elif not form.errors:
+                count = self.update_bulk_objects(request, queryset, OrderedDict((name, form.cleaned_data[name]) for name in chosen))
+                self.message_user(request, _('%(count)s %(name_plural)s were updated.') % {
+                    'count': count,
+                    'name_plural': force_text(opts.verbose_name_plural),
+                }, messages.SUCCESS)
+                return None
+
+        else:
+            form = form_class(prefix='bulk_update')
+
+        context = dict(
+            self.admin_site.each_context(request) if django.VERSION >= (1, 8) else self.admin_site.each_context(),
+            title=_('Update %s') % force_text(opts.verbose_name_plural),
+            opts=opts,
+            form=form,
+            chosen=chosen,
+            count=queryset.count(),
+            selected=request.POST.getlist(admin.ACTION_CHECKBOX_NAME),
+            select_across=request.POST.get('select_across', '0'),
+            action_checkbox_name=admin.ACTION_CHECKBOX_NAME,
+            media=self.media + form.media,
+        )
+
+        return TemplateResponse(request, self.bulk_update_template or [
+            'bulk_admin/%s/%s/bulk_update.html' % (opts.app_label, opts.model_name),
+            'bulk_admin/%s/bulk_update.html' % opts.app_label,
+            'bulk_admin/bulk_update.html'
+        ], context)
+
+    bulk_update_action.short_description = ugettext_lazy('Update selected')
+
+    def get_bulk_update_fields(self, request):
+        """
+        Returns the names of the fields bulk_update_action may set: the fields
+        of bulk_update_fields or else the concrete, editable fields, which
+        aren't unique and aren't files.
+        """
+        if self.bulk_update_fields is not None:
+            return list(self.bulk_update_fields)
+
+        return [
+            field.name for field in self.model._meta.concrete_fields
+            if field.editable and not field.unique and not isinstance(field, FileField)
+        ]
+
+    def get_bulk_update_form(self, request):
+        """
+        Returns a form class with the fields of get_bulk_update_fields, as
+        they are in the form of the bulk inline.
+        """
+        base_fields = self.get_bulk_inline(request).get_formset(request).form.base_fields
+        form_class = type(str('BulkUpdateForm'), (forms.Form,), {})
+        form_class.base_fields = OrderedDict(
+            (name, copy.deepcopy(base_fields[name])) for name in self.get_bulk_update_fields(request) if name in base_fields
+        )
+
+        return form_class
+
+    def update_bulk_objects(self, request, queryset, values):
+        """
+        Sets the fields of all objects of *queryset* to *values* with one
+        update per batch of bulk_save_batch_size objects and returns the
+        number of updated objects. Fields with auto_now are set as well.
+        Model save() is not called and no signals are sent.
+        """
+        model = self.model
+        using = router.db_for_write(model)
+        manager = model._default_manager.using(using)
+        values = dict(values)
+        pk_list = list(queryset.values_list('pk', flat=True))
+        related_lookups = self.get_bulk_related_lookups(request)
+        updated = 0
+
+        for field in model._meta.concrete_fields:
+            if getattr(field, 'auto_now', False) and field.name not in values:
+                values[field.name] = field.pre_save(model(), False)
+
+        for batch in _chunked(pk_list, self.get_bulk_save_batch_size(request)):
+            with transaction.atomic(using=using):
+                updated += manager.filter(pk__in=batch).update(**values)
+
+                objects = manager.filter(pk__in=batch)
+                if related_lookups:
+                    objects = objects.select_related(*related_lookups)
+
+                self.log_bulk_update(request, objects, values)
+
+        return updated
+
+    def log_bulk_update(self, request, queryset, values):
+        """
+        Records the change of the fields of *values* of all objects of
+        *queryset* in the admin log, with a single insert.
+        """
+        if not self.bulk_log_entries:
+            return
+
+        from django.contrib.admin.models import CHANGE, LogEntry
+        from django.contrib.contenttypes.models import ContentType
+
+        content_type = ContentType.objects.get_for_model(self.model, for_concrete_model=False)
+        change_message = _('Changed %s.') % get_text_list(list(values), _('and'))
+
+        LogEntry.objects.bulk_create([
+            LogEntry(
+                user_id=request.user.pk,
+                content_type_id=content_type.pk,
+                object_id=force_text(obj.pk),
+                object_repr=force_text(obj)[:200],
+                action_flag=CHANGE,
+                change_message=change_message,
+            )
+            for obj in queryset
+        ])
+
+    def bulk_export_csv_action(self, request, queryset):
+        return self.response_bulk_export(request, queryset, 'csv')
+
+    bulk_export_csv_action.short_description = ugettext_lazy('Export as CSV')
+
+    def bulk_export_json_action(self, request, queryset):
+        return self.response_bulk_export(request, queryset, 'jsonl')
+
+    bulk_export_json_action.short_description = ugettext_lazy('Export as JSON Lines')
+
+    def response_bulk_export(self, request, queryset, export_format):
+        """
+        Streams the objects of *queryset* as CSV with a header row or as JSON
+        Lines, with the columns of get_bulk_export_fields.
+        """
+        opts = self.model._meta
+        fields = self.get_bulk_export_fields(request)
+        names = [field.name for field in fields]
+        rows = self.iter_bulk_export_rows(request, queryset, fields)
+
+        if export_format == 'csv':
+            content = _iter_csv_lines(names, rows)
+            content_type = 'text/csv; charset=utf-8'
+        else:
+            content = (json.dumps(OrderedDict(zip(names, row)), cls=DjangoJSONEncoder) + '\n' for row in rows)
+            content_type = 'application/x-ndjson'
+
+        response = StreamingHttpResponse(content, content_type=content_type)
+        response['Content-Disposition'] = 'attachment; filename="{}.{}"'.format(opts.model_name, export_format)
+
+        return response
+
+    def get_bulk_export_fields(self, request):
+        """
+        Returns the primary key and the model fields of the bulk inline's form.
+        """
+        opts = self.model._meta
+        form_class = self.get_bulk_inline(request).get_formset(request).form
+        fields = [opts.pk]
+
+        for name in form_class.base_fields:
+            try:
+                field = opts.get_field(name)
+            except FieldDoesNotExist:
+                continue
+
+            if field not in fields:
+                fields.append(field)
+
+        return fields
+
+    def get_bulk_export_chunk_size(self, request):
+        return self.bulk_export_chunk_size
+
+    def iter_bulk_export_rows(self, request, queryset, fields):
+        """
+        Yields the values of *fields* for every object of *queryset*. The
+        objects are read in chunks of bulk_export_chunk_size ordered by primary
+        key, with the many to many values of every chunk prefetched.
+        """
+        chunk_size = self.get_bulk_export_chunk_size(request)
+        m2m_fields = [field for field in fields if isinstance(field, ManyToManyField)]
+        queryset = queryset.order_by('pk')
+
+        if m2m_fields:
+            queryset = queryset.prefetch_related(*[field.name for field in m2m_fields])
+
+        last_pk = None
+
+        while True:
+            chunk = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+            chunk = chunk[:chunk_size]
+            objects = list(chunk if m2m_fields else chunk.iterator())
+
+            for obj in objects:
+                yield [_export_value(field, obj) for field in fields]
+
+            if len(objects) < chunk_size:
+                return
+
+            last_pk = objects[-1].pk
+
+    def save_bulk_selection(self, request, selection):
+        """
+        Stores the selection in the session and returns the token
+        referencing it.
+        """
+        token = uuid.uuid4().hex
+        selections = request.session.get(_SESSION_KEY_BULK_SELECTIONS, [])
+        selections.append([token, selection])
+        request.session[_SESSION_KEY_BULK_SELECTIONS] = selections[-self.bulk_selection_limit:]
+
+        return token
+
+    def load_bulk_selection(self, request, token):
+        for stored_token, selection in request.session.get(_SESSION_KEY_BULK_SELECTIONS, []):
+            if stored_token == token:
+                return selection
+        return None
+
+    def get_bulk_selection_queryset(self, request, queryset, token):
+        """
+        Filters *queryset* by the selection stored under *token*. A selection
+        of all rows matching the changelist filters results in a subquery.
+        Selected primary keys beyond bulk_lookup_batch_size are looked up in
+        batches with get_bulk_objects instead of a single IN clause.
+        """
+        selection = self.load_bulk_selection(request, token)
+
+        if selection is None:
+            return queryset.none()
+
+        if 'filters' in selection:
+            changelist = self.get_bulk_selection_changelist(request, selection['filters'])
+            return queryset.filter(pk__in=changelist.queryset.values('pk'))
+
+        to_python = self.model._meta.pk.to_python
+
+        return self._get_bulk_pks_queryset(request, queryset, [to_python(pk) for pk in selection['pks']])
+
+    def _get_bulk_pks_queryset(self, request, queryset, pks):
+        if len(pks) > self.get_bulk_lookup_batch_size(request):
+            return self.get_bulk_objects(request, queryset, pks)
+
+        return queryset.filter(pk__in=pks)
+
+    def get_bulk_selection_changelist(self, request, filters):
+        changelist_request = copy.copy(request)
+        changelist_request.GET = QueryDict(filters)
+
+        list_display = self.get_list_display(changelist_request)
+        ChangeList = self.get_changelist(changelist_request)
+
+        return ChangeList(
+            changelist_request, self.model, list_display,
+            self.get_list_display_links(changelist_request, list_display),
+            self.get_list_filter(changelist_request), self.date_hierarchy,
+            self.get_search_fields(changelist_request), self.list_select_related,
+            self.list_per_page, self.list_max_show_all, self.list_editable, self
+        )
+
+
+class BulkModelChoiceField(forms.ModelChoiceField):
+    """
+    A ModelChoiceField which validates against the choices shared by all
+    forms of a BulkModelFormSet instead of querying for every form.
+    """
+
+    shared_choices = None
+
+    def to_python(self, value):
+        if self.shared_choices is None or value in self.empty_values:
+            return super(BulkModelChoiceField, self).to_python(value)
+        try:
+            return self.shared_choices.objects[force_text(value)]
+        except KeyError:
+            raise ValidationError(self.error_messages['invalid_choice'], code='invalid_choice')
+
+
+class BulkModelMultipleChoiceField(forms.ModelMultipleChoiceField):
+    """
+    A ModelMultipleChoiceField which validates against the choices shared by
+    all forms of a BulkModelFormSet instead of querying for every form.
+    """
+
+    shared_choices = None
+
+    def _check_values(self, value):
+        if self.shared_choices is None:
+            return super(BulkModelMultipleChoiceField, self)._check_values(value)
+
+        objects = OrderedDict()
+        for key in value:
+            try:
+                objects[force_text(key)] = self.shared_choices.objects[force_text(key)]
+            except KeyError:
+                raise ValidationError(
+                    self.error_messages['invalid_choice'],
+                    code='invalid_choice',
+                    params={'value': key},
+                )
+
+        return list(objects.values())
+
+
+class BulkModelFormSet(BaseModelFormSet):
+
+    share_choices = False
+    shared_choices_batch_size = 500
+    validate_unique_in_bulk = False
+    validate_unique_batch_size = 500
+
+    def add_fields(self, form, index):
+        super(BulkModelFormSet, self).add_fields(form, index)
+
+        # The edited objects are looked up in the queryset of the formset instead of once per form
+        pk_field = form.fields.get(self._pk_field.name)
+        if type(pk_field) is forms.ModelChoiceField:
+            pk_field = _FormsetPkField(pk_field.queryset, initial=pk_field.initial, required=pk_field.required, widget=pk_field.widget)
+            pk_field.formset = self
+            form.fields[self._pk_field.name] = pk_field
+
+        if self.share_choices:
+            self.share_form_choices(form)
+
+    def share_form_choices(self, form):
+        """
+        Makes the relation fields of *form* use choices which are loaded once
+        for the whole formset. With share_choices set to 'client', only the
+        selected choices are rendered and bulk.js adds the others from the
+        JSON in client_choices_json.
+        """
+        for name, field in six.iteritems(form.fields):
+            if not isinstance(field, (BulkModelChoiceField, BulkModelMultipleChoiceField)):
+                continue
+
+            shared_choices = self.get_shared_choices(name, field)
+            field.shared_choices = shared_choices
+
+            if shared_choices.raw:
+                # Raw id widgets don't render any choices
+                continue
+
+            choices = shared_choices.get_choices(field)
+
+            if self.share_choices == 'client':
+                if form.is_bound:
+                    selected = field.widget.value_from_datadict(form.data, form.files, form.add_prefix(name))
+                else:
+                    selected = form.initial.get(name, field.initial)
+
+                if not isinstance(selected, (list, tuple)):
+                    selected = [selected]
+
+                selected = set(force_text(field.prepare_value(value)) for value in selected if value is not None)
+                choices = [choice for choice in choices if choice[0] == '' or force_text(choice[0]) in selected]
+                getattr(field.widget, 'widget', field.widget).attrs['data-bulk-choices'] = name
+
+            field.choices = choices
+
+    def get_shared_choices(self, name, field):
+        if not hasattr(self, '_shared_choices'):
+            self._shared_choices = OrderedDict()
+
+        if name not in self._shared_choices:
+            raw = isinstance(getattr(field.widget, 'widget', field.widget), ForeignKeyRawIdWidget)
+            keys = None
+
+            if raw:
+                # Only load the objects referenced by the submitted data
+                keys = []
+                if self.is_bound:
+                    for index in range(self.total_form_count()):
+                        value = field.widget.value_from_datadict(self.data, self.files, '{}-{}'.format(self.add_prefix(index), name))
+                        keys.extend(value if isinstance(value, (list, tuple)) else [value])
+
+            self._shared_choices[name] = _SharedChoices(field, keys, raw, self.shared_choices_batch_size)
+
+        return self._shared_choices[name]
+
+    @property
+    def client_choices_json(self):
+        if self.share_choices != 'client' or not getattr(self, '_shared_choices', None):
+            return None
+
+        choices = {
+            name: [[force_text(value), force_text(label)] for value, label in shared_choices.choices if value != '']
+            for name, shared_choices in six.iteritems(self._shared_choices)
+            if not shared_choices.raw
+        }
+
+        return _json_script(choices)
+
+    def _construct_form(self, i, **kwargs):
+        form = super(BulkModelFormSet, self)._construct_form(i, **kwargs)
+        form._validate_unique_in_formset = self.validate_unique_in_bulk
+        form._validate_delete_in_formset = True
+        return form
+
+    def clean(self):
+        super(BulkModelFormSet, self).clean()
+        self.validate_delete_protection()
+        self.validate_pending_files()
+
+    def validate_delete_protection(self):
+        """
+        Checks all forms marked for deletion for protected related objects,
+        collecting the related objects of all instances at once. The related
+        objects are reported by the forms. As forms marked for deletion don't
+        invalidate the formset, it reports how many can't be deleted.
+        """
+        if not self.can_delete:
+            return
+
+        forms_to_delete = [
+            form for form in self.initial_forms
+            if hasattr(form, 'cleaned_data') and self._should_delete_form(form) and form.instance.pk is not None
+        ]
+
+        if not forms_to_delete:
+            return
+
+        protected = _collect_protected([form.instance for form in forms_to_delete], router.db_for_write(self.model))
+        count = 0
+
+        for form in forms_to_delete:
+            if form.instance in protected:
+                form.add_error(None, _deleting_protected_error(form.instance, protected[form.instance]))
+                count += 1
+
+        if count:
+            raise ValidationError(
+                ungettext(
+                    '%(count)d object can\'t be deleted, as protected related objects refer to it.',
+                    '%(count)d objects can\'t be deleted, as protected related objects refer to them.',
+                    count,
+                ),
+                code='deleting_protected',
+                params={'count': count},
+            )
+
+    def validate_pending_files(self):
+        """
+        Adds an error to the forms of bulk uploaded files, which were left out
+        because generating their data timed out.
+        """
+        for form in self.forms:
+            name = form.data.get(form.add_prefix('PENDING_FILE'))
+
+            if name:
+                form.add_error(None, ValidationError(
+                    _('The data of the file %(name)s could not be generated in time.'),
+                    code='pending_file',
+                    params={'name': name},
+                ))
+
+    def validate_unique(self):
+        if self.validate_unique_in_bulk:
+            self.validate_unique_against_database()
+        super(BulkModelFormSet, self).validate_unique()
+
+    def validate_unique_against_database(self):
+        """
+        Performs the unique checks of all forms with one query per unique
+        constraint (and batch), instead of one query per constraint and form.
+        Duplicates within the formset are detected by validate_unique.
+        """
+        forms_to_delete = self.deleted_forms
+        candidates = OrderedDict()
+
+        for form in self.forms:
+            if not hasattr(form, 'cleaned_data') or form in forms_to_delete:
+                continue
+            if form.empty_permitted and not form.has_changed():
+                continue
+
+            instance = form.instance
+            unique_checks, date_checks = instance._get_unique_checks(exclude=form._get_validation_exclusions())
+
+            errors = instance._perform_date_checks(date_checks)
+            if errors:
+                form._update_errors(ValidationError(errors))
+
+            for model_class, unique_check in unique_checks:
+                values = []
+                for field_name in unique_check:
+                    field = instance._meta.get_field(field_name)
+                    if field.primary_key and not instance._state.adding:
+                        break
+                    value = getattr(instance, field.attname)
+                    if value is None:
+                        break
+                    values.append(value)
+                else:
+                    candidates.setdefault((model_class, unique_check), []).append((form, tuple(values)))
+
+        for (model_class, unique_check), entries in six.iteritems(candidates):
+            existing = self.get_existing_unique_values(model_class, unique_check, [values for form, values in entries])
+
+            for form, values in entries:
+                pks = set(existing.get(values, ()))
+                instance = form.instance
+                model_class_pk = instance._get_pk_val(model_class._meta)
+
+                if not instance._state.adding and model_class_pk is not None:
+                    pks.discard(model_class_pk)
+
+                if pks:
+                    key = unique_check[0] if len(unique_check) == 1 else NON_FIELD_ERRORS
+                    message = instance.unique_error_message(model_class, unique_check)
+                    form._update_errors(ValidationError({key: [message]}))
+
+    def get_existing_unique_values(self, model_class, unique_check, values_list):
+        """
+        Returns a dict mapping the values of *unique_check* which already exist
+        in the database to the primary keys of the rows holding them. Rows
+        matched by the database but holding different values, as with case
+        insensitive collations, are attributed by checking the values of
+        their batch on their own.
+        """
+        existing = {}
+        values_list = list(OrderedDict.fromkeys(values_list))
+        batch_size = max(1, self.validate_unique_batch_size // len(unique_check))
+
+        for batch in _chunked(values_list, batch_size):
+            if len(unique_check) == 1:
+                lookup = Q(**{'{}__in'.format(unique_check[0]): [values[0] for values in batch]})
+            else:
+                lookup = reduce(operator.or_, (Q(**dict(zip(unique_check, values))) for values in batch))
+
+            rows = model_class._default_manager.filter(lookup).values_list('pk', *unique_check)
+            batch_values = set(batch)
+            unmatched = False
+
+            for row in rows:
+                values = tuple(row[1:])
+                if values in batch_values:
+                    existing.setdefault(values, []).append(row[0])
+                else:
+                    unmatched = True
+
+            if unmatched:
+                # The database matched rows whose values differ from the checked ones, e.g. by a case insensitive
+                # collation. Which values they conflict with is only known by checking the values on their own.
+                for values in batch:
+                    if values not in existing:
+                        pks = list(model_class._default_manager.filter(**dict(zip(unique_check, values))).values_list('pk', flat=True))
+                        if pks:
+                            existing[values] = pks
+
+        return existing
+
 
 class BulkInlineModelAdmin(InlineModelAdmin):
 
-    formset = BaseModelFormSet
+    formset = BulkModelFormSet
+    formset_cache_size = 0
+    plan_related = True
+    share_choices = False
+    validate_unique_in_bulk = False
 
     def __init__(self, parent_model, admin_site):
         self.model = self.model if self.model is not None else parent_model
@@ -381,6 +2094,13 @@ class BulkInlineModelAdmin(InlineModelAdmin):
         }
 
         defaults.update(kwargs)
+
+        cache_key = self._get_formset_cache_key(request, obj, defaults)
+        if cache_key is not None:
+            formset = self._get_formset_cache().get(cache_key)
+            if formset is not None:
+                return formset
+
         base_model_form = defaults['form']
 
         class DeleteProtectedModelForm(base_model_form):
@@ -391,6 +2111,9 @@ class BulkInlineModelAdmin(InlineModelAdmin):
                 templates it's not rendered using the field information, but
                 just using a generic "deletion_field" of the InlineModelAdmin.
                 """
+                # BulkModelFormSet checks all forms marked for deletion at once
+                if getattr(self, '_validate_delete_in_formset', False):
+                    return
                 if self.cleaned_data.get(DELETION_FIELD_NAME, False):
                     using = router.db_for_write(self._meta.model)
                     collector = NestedObjects(using=using)
@@ -398,22 +2121,12 @@ class BulkInlineModelAdmin(InlineModelAdmin):
                         return
                     collector.collect([self.instance])
                     if collector.protected:
-                        objs = []
-                        for p in collector.protected:
-                            objs.append(
-                                # Translators: Model verbose name and instance representation,
-                                # suitable to be an item in a list.
-                                _('%(class_name)s %(instance)s') % {
-                                    'class_name': p._meta.verbose_name,
-                                    'instance': p}
-                            )
-                        params = {'class_name': self._meta.model._meta.verbose_name,
-                                  'instance': self.instance,
-                                  'related_objects': get_text_list(objs, _('and'))}
-                        msg = _("Deleting %(class_name)s %(instance)s would require "
-                                "deleting the following protected related objects: "
-                                "%(related_objects)s")
-                        raise ValidationError(msg, code='deleting_protected', params=params)
+                        raise _deleting_protected_error(self.instance, collector.protected)
+
+            def validate_unique(self):
+                # BulkModelFormSet validates the unique constraints of all forms at once
+                if not getattr(self, '_validate_unique_in_formset', False):
+                    super(DeleteProtectedModelForm, self).validate_unique()
 
             def is_valid(self):
                 result = super(DeleteProtectedModelForm, self).is_valid()
@@ -425,7 +2138,126 @@ class BulkInlineModelAdmin(InlineModelAdmin):
         if defaults['fields'] is None and not modelform_defines_fields(defaults['form']):
             defaults['fields'] = forms.ALL_FIELDS
 
-        return modelformset_factory(self.model, **defaults)
+        formset = modelformset_factory(self.model, **defaults)
+        formset.share_choices = self.share_choices
+        formset.validate_unique_in_bulk = self.validate_unique_in_bulk
+
+        if cache_key is not None:
+            self._get_formset_cache().set(cache_key, formset, self.formset_cache_size)
+
+        return formset
+
+    def get_related_lookups(self, request, formset_class):
+        """
+        Returns the relations to select and the relations to prefetch for the
+        rows of *formset_class*: the foreign keys shown as readonly fields and
+        the many to many fields of the form or shown as readonly fields.
+        """
+        opts = self.model._meta
+        readonly_fields = [name for name in self.get_readonly_fields(request) if isinstance(name, six.string_types)]
+        select_related = []
+        prefetch_related = []
+
+        for name in list(formset_class.form.base_fields) + readonly_fields:
+            try:
+                field = opts.get_field(name)
+            except FieldDoesNotExist:
+                continue
+
+            if isinstance(field, ManyToManyField):
+                if name not in prefetch_related:
+                    prefetch_related.append(name)
+            elif isinstance(field, ForeignKey) and name in readonly_fields:
+                select_related.append(name)
+
+        return select_related, prefetch_related
+
+    def apply_related_lookups(self, request, queryset, formset_class, select_related=()):
+        """
+        Returns *queryset* loading the relations of get_related_lookups and
+        *select_related* for all rows at once, instead of once per row. Lists
+        of objects get the relations prefetched in place.
+        """
+        if not self.plan_related:
+            return queryset
+
+        form_select_related, prefetch_related = self.get_related_lookups(request, formset_class)
+        select_related = list(select_related) + [name for name in form_select_related if name not in select_related]
+
+        if isinstance(queryset, list):
+            _prefetch_related(queryset, select_related + prefetch_related)
+            return queryset
+
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+
+        return queryset
+
+    def formfield_for_foreignkey(self, db_field, request=None, **kwargs):
+        if self.share_choices:
+            kwargs.setdefault('form_class', BulkModelChoiceField)
+        return super(BulkInlineModelAdmin, self).formfield_for_foreignkey(db_field, request, **kwargs)
+
+    def formfield_for_manytomany(self, db_field, request=None, **kwargs):
+        if self.share_choices:
+            kwargs.setdefault('form_class', BulkModelMultipleChoiceField)
+        return super(BulkInlineModelAdmin, self).formfield_for_manytomany(db_field, request, **kwargs)
+
+    def get_formset_cache_key(self, request, obj=None):
+        """
+        Returns the request dependent part of the key under which formset
+        classes are cached. Form fields are built with formfield_for_dbfield,
+        whose widgets depend on the permissions of the user.
+        """
+        user = request.user
+        return user.is_superuser, frozenset(user.get_all_permissions())
+
+    def _get_formset_cache_key(self, request, obj, defaults):
+        if not self.formset_cache_size:
+            return None
+
+        # The fields of overridden formfield_for_* methods may depend on anything of the request,
+        # unless the cache key is extended as well
+        if self._overrides(*_FORMFIELD_METHODS) and not self._overrides('get_formset_cache_key'):
+            return None
+
+        items = []
+        for name, value in sorted(six.iteritems(defaults)):
+            if name == 'formfield_callback':
+                continue
+            if isinstance(value, list):
+                value = tuple(value)
+            items.append((name, value))
+
+        key = (self.model, self.admin_site, self.share_choices, self.validate_unique_in_bulk, tuple(items),
+               self.get_formset_cache_key(request, obj))
+
+        try:
+            hash(key)
+        except TypeError:
+            return None
+
+        return key
+
+    def _overrides(self, *names):
+        return any(
+            six.get_unbound_function(getattr(self.__class__, name)) is not six.get_unbound_function(getattr(BulkInlineModelAdmin, name))
+            for name in names
+        )
+
+    def _get_formset_cache(self):
+        return _formset_caches.setdefault(self.__class__, _BoundedCache())
+
+    @classmethod
+    def clear_formset_cache(cls):
+        """
+        Removes the cached formset classes of this inline and its subclasses.
+        """
+        for inline_class, cache in list(six.iteritems(_formset_caches)):
+            if issubclass(inline_class, cls):
+                cache.clear()
 
 
 class StackedBulkInlineModelAdmin(BulkInlineModelAdmin):
@@ -436,5 +2268,723 @@ class TabularBulkInlineModelAdmin(BulkInlineModelAdmin):
     template = 'admin/edit_inline/tabular.html'
 
 
+class BulkTimings(object):
+    """
+    The wall time in seconds, the number of database queries and the number
+    of rows of the phases of a bulk request, by phase name.
+    """
+
+    def __init__(self, using, count_queries=True):
+        self.connection = connections[using]
+        self.count_queries = count_queries
+        self.phases = OrderedDict()
+        self._query_count = 0
+        self._query_log = None
+
+    @contextmanager
+    def counting_queries(self):
+        connection = self.connection
+
+        if not self.count_queries:
+            yield
+            return
+
+        if hasattr(connection, 'execute_wrapper'):
+            with connection.execute_wrapper(self._count_query):
+                yield
+            return
+
+        # Django < 2.0 can only count the queries of the debug cursor. Its
+        # log is capped, so the appended queries are counted instead.
+        debug_name = 'force_debug_cursor' if hasattr(connection, 'force_debug_cursor') else 'use_debug_cursor'
+        log_name = 'queries_log' if hasattr(connection, 'queries_log') else 'queries'
+        debug_cursor = getattr(connection, debug_name)
+        query_log = getattr(connection, log_name)
+        self._query_log = _CountingQueryLog(query_log)
+        setattr(connection, debug_name, True)
+        setattr(connection, log_name, self._query_log)
+
+        try:
+            yield
+        finally:
+            setattr(connection, debug_name, debug_cursor)
+            setattr(connection, log_name, query_log)
+            self._query_count += self._query_log.count
+            self._query_log = None
+
+    def _count_query(self, execute, sql, params, many, context):
+        self._query_count += 1
+        return execute(sql, params, many, context)
+
+    def get_query_count(self):
+        if self._query_log is not None:
+            return self._query_count + self._query_log.count
+        return self._query_count
+
+    @contextmanager
+    def phase(self, name, rows=0):
+        start = timeit.default_timer()
+        query_count = self.get_query_count()
+
+        try:
+            yield
+        finally:
+            self.add_phase(name, timeit.default_timer() - start, self.get_query_count() - query_count, rows)
+
+    def add_phase(self, name, duration, queries=0, rows=0):
+        phase = self.phases.setdefault(name, {'duration': 0.0, 'queries': 0, 'rows': 0})
+        phase['duration'] += duration
+        phase['queries'] += queries
+        phase['rows'] += rows
+
+    def server_timing(self):
+        return ', '.join(
+            '{};dur={:.1f};desc="{} queries, {} rows"'.format(name, phase['duration'] * 1000, phase['queries'], phase['rows'])
+            for name, phase in six.iteritems(self.phases)
+        )
+
+
+class _CountingQueryLog(object):
+    """
+    Counts the queries appended to the query log of a connection, while
+    passing them on to the log.
+    """
+
+    def __init__(self, log):
+        self.log = log
+        self.count = 0
+
+    def __getattr__(self, name):
+        return getattr(self.log, name)
+
+    def __getitem__(self, index):
+        return self.log[index]
+
+    def __iter__(self):
+        return iter(self.log)
+
+    def __len__(self):
+        return len(self.log)
+
+    def append(self, query):
+        self.count += 1
+        self.log.append(query)
+
+
 class _ListQueryset(list):
     ordered = True
+
+
+class _FormsetPkField(forms.ModelChoiceField):
+    """
+    The primary key field of the forms of a BulkModelFormSet, which takes the
+    edited objects from the queryset of the formset.
+    """
+
+    formset = None
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+
+        pk_field = self.formset.model._meta.pk
+        to_python = self.formset._get_to_python(pk_field) if hasattr(self.formset, '_get_to_python') else pk_field.to_python
+
+        try:
+            obj = self.formset._existing_object(to_python(value))
+        except ValidationError:
+            obj = None
+
+        # Objects outside of the queryset of the formset are looked up as usual
+        if obj is None:
+            return super(_FormsetPkField, self).to_python(value)
+
+        return obj
+
+
+class _OverlayDict(MultiValueDict):
+    """
+    A read only MultiValueDict, which appends the lists of the dict *overlay*
+    to the ones of the MultiValueDict *base* without copying *base*.
+    """
+
+    def __init__(self, base, overlay):
+        super(_OverlayDict, self).__init__()
+        self.base = base
+        self.overlay = overlay
+
+    def __repr__(self):
+        return '<{}: {!r}>'.format(self.__class__.__name__, dict(self._iterlists()))
+
+    def __getitem__(self, key):
+        if key not in self.overlay:
+            return self.base[key]
+
+        values = self.getlist(key)
+        return values[-1] if values else []
+
+    def __contains__(self, key):
+        return key in self.overlay or key in self.base
+
+    has_key = __contains__
+
+    def __iter__(self):
+        for key in self.base:
+            yield key
+
+        for key in self.overlay:
+            if key not in self.base:
+                yield key
+
+    def __len__(self):
+        return len(self.base) + len([key for key in self.overlay if key not in self.base])
+
+    def __copy__(self):
+        return MultiValueDict(list(self._iterlists()))
+
+    def __deepcopy__(self, memo):
+        return copy.deepcopy(self.__copy__(), memo)
+
+    def __reduce__(self):
+        return MultiValueDict, (list(self._iterlists()),)
+
+    def _immutable(self, *args, **kwargs):
+        raise AttributeError('{} instances are immutable'.format(self.__class__.__name__))
+
+    __setitem__ = __delitem__ = setlist = setlistdefault = appendlist = update = _immutable
+    pop = popitem = clear = setdefault = _immutable
+
+    def getlist(self, key, default=None):
+        if key not in self.overlay:
+            return self.base.getlist(key, default)
+
+        return self.base.getlist(key, []) + list(self.overlay[key])
+
+    def _iterkeys(self):
+        return iter(self)
+
+    def _iterlists(self):
+        for key in self:
+            yield key, self.getlist(key)
+
+    def _iteritems(self):
+        for key in self:
+            yield key, self[key]
+
+    def _itervalues(self):
+        for key in self:
+            yield self[key]
+
+    if six.PY3:
+        keys = _iterkeys
+        lists = _iterlists
+        items = _iteritems
+        values = _itervalues
+    else:
+        iterkeys = _iterkeys
+        iterlists = _iterlists
+        iteritems = _iteritems
+        itervalues = _itervalues
+
+        def keys(self):
+            return list(self._iterkeys())
+
+        def lists(self):
+            return list(self._iterlists())
+
+        def items(self):
+            return list(self._iteritems())
+
+        def values(self):
+            return list(self._itervalues())
+
+    def copy(self):
+        return self.__copy__()
+
+    def dict(self):
+        return dict((key, self[key]) for key in self)
+
+
+class _SharedChoices(object):
+
+    def __init__(self, field, keys=None, raw=False, batch_size=500):
+        self.raw = raw
+        self.choices = None
+        queryset = field.queryset
+        key = field.to_field_name or 'pk'
+
+        if keys is None:
+            objects = list(queryset)
+        else:
+            key_field = queryset.model._meta.pk if key == 'pk' else queryset.model._meta.get_field(key)
+            values = set()
+            for value in keys:
+                if value in field.empty_values:
+                    continue
+                try:
+                    values.add(key_field.to_python(value))
+                except ValidationError:
+                    pass
+
+            objects = []
+            for batch in _chunked(values, batch_size):
+                objects.extend(queryset.filter(**{'{}__in'.format(key): batch}))
+
+        self.objects = OrderedDict((force_text(field.prepare_value(obj)), obj) for obj in objects)
+
+    def get_choices(self, field):
+        if self.choices is None:
+            choices = [('', field.empty_label)] if getattr(field, 'empty_label', None) is not None else []
+            choices.extend((field.prepare_value(obj), field.label_from_instance(obj)) for obj in six.itervalues(self.objects))
+            self.choices = choices
+        return self.choices
+
+
+class _BoundedCache(object):
+
+    def __init__(self):
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.pop(key, None)
+            if value is not None:
+                self._data[key] = value
+            return value
+
+    def set(self, key, value, max_size):
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = value
+            while len(self._data) > max_size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class _CsvBuffer(object):
+
+    def write(self, value):
+        return value
+
+
+class _TaskStart(object):
+    """
+    Calls a pool task and records when a thread picked it up.
+    """
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.time = None
+
+    def __call__(self, func, *args):
+        self.time = timeit.default_timer()
+        self.event.set()
+        return _call_closing_connections(func, *args)
+
+
+_formset_caches = {}
+
+_FORMFIELD_METHODS = ('formfield_for_dbfield', 'formfield_for_choice_field', 'formfield_for_foreignkey', 'formfield_for_manytomany', 'get_field_queryset')
+_bulk_job_pool = None
+_bulk_job_pool_lock = threading.Lock()
+
+
+def _get_bulk_job_pool(processes):
+    global _bulk_job_pool
+
+    with _bulk_job_pool_lock:
+        if _bulk_job_pool is None:
+            _bulk_job_pool = ThreadPool(processes)
+        return _bulk_job_pool
+
+
+def _call_closing_connections(func, *args):
+    try:
+        return func(*args)
+    finally:
+        # Pool threads don't close the connections they opened otherwise
+        for connection in connections.all():
+            connection.close()
+
+
+def _deleting_protected_error(instance, protected):
+    objs = []
+    for p in protected:
+        objs.append(
+            # Translators: Model verbose name and instance representation,
+            # suitable to be an item in a list.
+            _('%(class_name)s %(instance)s') % {
+                'class_name': p._meta.verbose_name,
+                'instance': p}
+        )
+    params = {'class_name': instance._meta.verbose_name,
+              'instance': instance,
+              'related_objects': get_text_list(objs, _('and'))}
+    msg = _("Deleting %(class_name)s %(instance)s would require "
+            "deleting the following protected related objects: "
+            "%(related_objects)s")
+    return ValidationError(msg, code='deleting_protected', params=params)
+
+
+def _collect_protected(objs, using):
+    """
+    Returns a dict mapping each of *objs* whose deletion is prevented by
+    protected related objects to a list of these objects.
+    """
+    protected = OrderedDict()
+    remaining = list(objs)
+
+    # The collector stops at the first relation having protected objects,
+    # so collect again for the remaining objects until nothing is protected
+    while remaining:
+        collector = NestedObjects(using=using)
+        collector.collect(remaining)
+
+        if not collector.protected:
+            break
+
+        owners = _map_protected_to_roots(collector, remaining)
+
+        if not owners:
+            # Fall back to collecting every object on its own
+            for obj in remaining:
+                collector = NestedObjects(using=using)
+                collector.collect([obj])
+                if collector.protected:
+                    protected[obj] = list(collector.protected)
+            break
+
+        for owner, objs in six.iteritems(owners):
+            protected.setdefault(owner, []).extend(objs)
+
+        remaining = [obj for obj in remaining if obj not in owners]
+
+    return protected
+
+
+def _map_protected_to_roots(collector, roots):
+    parents = {}
+    collected = {}
+
+    for source, targets in six.iteritems(collector.edges):
+        for target in targets:
+            parents.setdefault(target, source)
+            collected[(target._meta.concrete_model, target.pk)] = target
+
+    roots = set(roots)
+    owners = OrderedDict()
+
+    for obj in collector.protected:
+        for field in obj._meta.concrete_fields:
+            if not field.rel:
+                continue
+
+            target = collected.get((field.rel.to._meta.concrete_model, getattr(obj, field.attname)))
+            seen = set()
+
+            while target is not None and target not in roots and target not in seen:
+                seen.add(target)
+                target = parents.get(target)
+
+            if target in roots:
+                owners.setdefault(target, []).append(obj)
+                break
+
+    return owners
+
+
+def _json_script(data):
+    # Safe to be embedded within a <script> element
+    data = json.dumps(data, cls=DjangoJSONEncoder)
+    return mark_safe(data.replace('<', '\\u003c').replace('>', '\\u003e').replace('&', '\\u0026'))
+
+
+def _widget_values(bound_field):
+    """
+    Returns the name suffix and the value of every input of *bound_field*.
+    """
+    value = bound_field.value()
+    widget = bound_field.field.widget
+    widget = getattr(widget, 'widget', widget)
+
+    if not isinstance(widget, forms.MultiWidget):
+        return [('', _widget_value(widget, value))]
+
+    if not isinstance(value, (list, tuple)):
+        value = widget.decompress(value)
+
+    return [('_{}'.format(index), _widget_value(subwidget, item)) for index, (subwidget, item) in enumerate(zip(widget.widgets, value))]
+
+
+def _widget_value(widget, value):
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, (list, tuple)):
+        return [force_text(item) for item in value]
+    if hasattr(widget, '_format_value'):
+        value = widget._format_value(value)
+
+    return force_text(value)
+
+
+def _bulk_commit_error(message, error):
+    return ValidationError(message, code='commit_error', params={'error': force_text(error)})
+
+
+def _formset_subset(formset, indexes):
+    """
+    Returns a copy of the validated *formset* containing the forms at
+    *indexes* only, which have to be in ascending order.
+    """
+    initial_form_count = formset.initial_form_count()
+    subset = copy.copy(formset)
+    subset.forms = [formset.forms[index] for index in indexes]
+    subset.initial_form_count = lambda: len([index for index in indexes if index < initial_form_count])
+    subset.total_form_count = lambda: len(indexes)
+    subset._non_form_errors = formset.error_class()
+    subset.__dict__.pop('_deleted_form_indexes', None)
+    return subset
+
+
+def _form_object_id(form):
+    if form.instance.pk is not None:
+        return form.instance.pk
+
+    # Deleted objects lose their primary key, but the form still has it
+    pk_name = form.instance._meta.pk.name
+    return form.data.get(form.add_prefix(pk_name))
+
+
+def _error_messages(errors):
+    if isinstance(errors, dict):
+        return {name: _error_messages(field_errors) for name, field_errors in six.iteritems(errors)}
+
+    return [force_text(message) for error in errors.as_data() for message in error.messages]
+
+
+def _iter_import_rows(stream, import_format):
+    """
+    Yields a (row number, data, error) tuple for every row of *stream*, which
+    is read line by line. Either data or the error message is None.
+    """
+    if import_format == 'csv':
+        if six.PY2:
+            reader = ([cell.decode('utf-8') for cell in row] for row in csv.reader(stream))
+        else:
+            reader = csv.reader(codecs.iterdecode(stream, 'utf-8'))
+
+        header = next(reader, None)
+
+        if not header:
+            return
+
+        header[0] = header[0].lstrip('\ufeff')
+
+        for number, row in enumerate(reader, 1):
+            if not row:
+                continue
+            if len(row) != len(header):
+                yield number, None, _('Expected %(count)d columns, got %(received)d.') % {
+                    'count': len(header),
+                    'received': len(row),
+                }
+            else:
+                yield number, dict(zip(header, row)), None
+
+    else:
+        for number, line in enumerate(stream, 1):
+            line = line.strip()
+
+            if not line:
+                continue
+
+            try:
+                data = json.loads(line.decode('utf-8'))
+            except ValueError:
+                yield number, None, _('Invalid JSON.')
+                continue
+
+            if isinstance(data, dict):
+                yield number, data, None
+            else:
+                yield number, None, _('Expected a JSON object.')
+
+
+def _export_value(field, obj):
+    if isinstance(field, ManyToManyField):
+        return [related.pk for related in getattr(obj, field.name).all()]
+
+    value = field.value_from_object(obj)
+
+    if isinstance(field, FileField):
+        return value.name or None
+
+    return value
+
+
+def _csv_value(value):
+    if value is None:
+        value = ''
+    elif isinstance(value, (list, tuple)):
+        value = ','.join(force_text(item) for item in value)
+    else:
+        value = force_text(value)
+
+    # The csv module of python 2 writes bytes only
+    return value.encode('utf-8') if six.PY2 else value
+
+
+def _iter_csv_lines(header, rows):
+    writer = csv.writer(_CsvBuffer())
+
+    yield writer.writerow([_csv_value(name) for name in header])
+
+    for row in rows:
+        yield writer.writerow([_csv_value(value) for value in row])
+
+
+def _write_field_file(field_file):
+    try:
+        field_file.save(field_file.name, field_file.file, save=False)
+    except Exception as e:
+        return e
+    return None
+
+
+def _prefetch_related(objects, lookups):
+    if not objects or not lookups:
+        return
+
+    if django.VERSION >= (1, 10):
+        prefetch_related_objects(objects, *lookups)
+    else:
+        prefetch_related_objects(objects, lookups)
+
+
+def _bulk_m2m_supported(field):
+    rel = field.rel
+    return rel.through._meta.auto_created and not (rel.symmetrical and rel.to == field.model)
+
+
+def _bulk_set_m2m(field, values, using, batch_size):
+    """
+    Sets the related objects of many to many *field* for all (instance,
+    related objects, created) tuples of *values* with batched queries on the
+    through model, sending m2m_changed for every instance with changes.
+    """
+    through = field.rel.through
+    source_attname = through._meta.get_field(field.m2m_field_name()).attname
+    target_attname = through._meta.get_field(field.m2m_reverse_field_name()).attname
+    manager = through._default_manager.using(using)
+    send_signals = m2m_changed.has_listeners(through)
+
+    instances = OrderedDict((instance.pk, instance) for instance, related, created in values)
+    wanted = {instance.pk: set(obj.pk for obj in related) for instance, related, created in values}
+    current = {}
+
+    # Created objects have no links yet
+    existing_pks = [instance.pk for instance, related, created in values if not created]
+
+    for batch in _chunked(existing_pks, batch_size):
+        rows = manager.filter(**{'{}__in'.format(source_attname): batch}).values_list('pk', source_attname, target_attname)
+
+        for pk, source, target in rows:
+            current.setdefault(source, {})[target] = pk
+
+    removed = OrderedDict()
+    added = OrderedDict()
+
+    for pk in instances:
+        links = current.get(pk, {})
+        removed_pks = set(links) - wanted[pk]
+        added_pks = wanted[pk] - set(links)
+
+        if removed_pks:
+            removed[pk] = removed_pks
+        if added_pks:
+            added[pk] = added_pks
+
+    for action, changes in (('remove', removed), ('add', added)):
+        if not changes:
+            continue
+
+        if send_signals:
+            for pk, pk_set in six.iteritems(changes):
+                m2m_changed.send(sender=through, action='pre_{}'.format(action), instance=instances[pk], reverse=False,
+                                 model=field.rel.to, pk_set=pk_set, using=using)
+
+        if action == 'remove':
+            link_pks = [current[pk][target] for pk, targets in six.iteritems(changes) for target in targets]
+
+            for batch in _chunked(link_pks, batch_size):
+                manager.filter(pk__in=batch).delete()
+        else:
+            manager.bulk_create([
+                through(**{source_attname: pk, target_attname: target})
+                for pk, targets in six.iteritems(changes) for target in targets
+            ], batch_size=batch_size)
+
+        if send_signals:
+            for pk, pk_set in six.iteritems(changes):
+                m2m_changed.send(sender=through, action='post_{}'.format(action), instance=instances[pk], reverse=False,
+                                 model=field.rel.to, pk_set=pk_set, using=using)
+
+    for instance in six.itervalues(instances):
+        # Prefetched related objects are outdated now
+        getattr(instance, '_prefetched_objects_cache', {}).pop(field.name, None)
+
+
+def _chunked(objects, size):
+    objects = list(objects)
+    size = size or len(objects) or 1
+
+    for start in range(0, len(objects), size):
+        yield objects[start:start + size]
+
+
+def _iter_chunks(iterable, size):
+    iterator = iter(iterable)
+
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _bulk_create_sets_pk(using, model):
+    if model._meta.parents:
+        return False
+    if not isinstance(model._meta.pk, AutoField):
+        return True
+
+    features = connections[using].features
+
+    return (getattr(features, 'can_return_rows_from_bulk_insert', False) or
+            getattr(features, 'can_return_ids_from_bulk_insert', False))
+
+
+def _bulk_update(queryset, objects, fields, batch_size):
+    if hasattr(queryset, 'bulk_update'):
+        queryset.bulk_update(objects, [field.name for field in fields], batch_size=batch_size)
+        return
+
+    if Case is None:
+        for obj in objects:
+            queryset.filter(pk=obj.pk).update(**{field.name: getattr(obj, field.attname) for field in fields})
+        return
+
+    # Django < 2.2 has no bulk_update, so build the CASE expressions ourselves
+    for batch in _chunked(objects, batch_size):
+        values = {
+            field.name: Case(
+                *[When(pk=obj.pk, then=Value(getattr(obj, field.attname), output_field=field)) for obj in batch],
+                output_field=field
+            )
+            for field in fields
+        }
+        queryset.filter(pk__in=[obj.pk for obj in batch]).update(**values)
@@ -0,0 +1,7 @@
+from __future__ import unicode_literals
+
+from django.dispatch import Signal
+
+
+# Sent by BulkModelAdmin.bulk_view with the BulkTimings of its phases
+bulk_view_timed = Signal(providing_args=['request', 'response', 'timings'])
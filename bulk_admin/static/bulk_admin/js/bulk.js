@@ -1,6 +1,146 @@
 (function($) {
     'use strict';
 
+    function randomUploadId() {
+        var id = '';
+        for (var i = 0; i < 32; i++) {
+            id += Math.floor(Math.random() * 16).toString(16);
+        }
+        return id;
+    }
+
+    function chunkedUpload(options, field, file, index) {
+        var deferred = $.Deferred();
+        var uploadId = randomUploadId();
+        var retries = 0;
+
+        function url(offset) {
+            return options.uploadUrl + '?' + $.param({
+                upload_id: uploadId,
+                field: field,
+                name: file.name,
+                size: file.size,
+                offset: offset,
+                index: index
+            });
+        }
+
+        function resume() {
+            if (retries++ >= options.retries) {
+                deferred.reject();
+                return;
+            }
+
+            $.ajax({url: url(0), type: 'GET', dataType: 'json'})
+                .done(function(data) {
+                    send(data.offset);
+                })
+                .fail(function() {
+                    setTimeout(resume, options.retryDelay);
+                });
+        }
+
+        function send(offset) {
+            $.ajax({
+                url: url(offset),
+                type: 'POST',
+                data: file.slice(offset, offset + options.chunkSize),
+                processData: false,
+                contentType: 'application/octet-stream',
+                dataType: 'json',
+                headers: {'X-CSRFToken': options.csrfToken}
+            }).done(function(data) {
+                retries = 0;
+                if (data.pk !== undefined) {
+                    deferred.resolve(data.pk);
+                } else {
+                    send(data.offset);
+                }
+            }).fail(function(xhr) {
+                if (xhr.status === 409 && xhr.responseJSON) {
+                    send(xhr.responseJSON.offset);
+                } else if (xhr.status === 400 || xhr.status === 413) {
+                    deferred.reject(xhr.responseJSON && xhr.responseJSON.errors);
+                } else {
+                    resume();
+                }
+            });
+        }
+
+        // Empty files are sent as a single empty chunk
+        send(0);
+
+        return deferred.promise();
+    }
+
+    function chunkedUploadAll(options, field, files, $this) {
+        var pks = new Array(files.length);
+        var next = 0;
+        var running = 0;
+        var failed = 0;
+        var done = 0;
+
+        function finish() {
+            // The server stores the primary keys as selection, so they don't end up in the URL
+            $.ajax({
+                url: options.uploadUrl + '?finish=1',
+                type: 'POST',
+                data: $.param({pks: $.grep(pks, function(pk) { return pk !== undefined; })}, true),
+                dataType: 'json',
+                headers: {'X-CSRFToken': options.csrfToken}
+            }).done(function(data) {
+                var params = {selection: data.selection};
+
+                if (options.isPopup) {
+                    params[options.isPopupName] = 1;
+                }
+                if (options.toField) {
+                    params[options.toFieldName] = options.toField;
+                }
+
+                window.location.href = window.location.pathname + '?' + $.param(params);
+            }).fail(function() {
+                if (options.failedMessage) {
+                    alert(options.failedMessage);
+                }
+            });
+        }
+
+        function start() {
+            while (running < options.parallelUploads && next < files.length) {
+                (function(index) {
+                    running++;
+                    chunkedUpload(options, field, files[index], index)
+                        .done(function(pk) {
+                            pks[index] = pk;
+                        })
+                        .fail(function() {
+                            failed++;
+                        })
+                        .always(function() {
+                            running--;
+                            done++;
+
+                            if (options.submittingMessage) {
+                                $this.text(options.submittingMessage + ' (' + done + '/' + files.length + ')');
+                            }
+
+                            if (done === files.length) {
+                                if (failed && options.failedMessage) {
+                                    alert(options.failedMessage);
+                                }
+                                finish();
+                            } else {
+                                start();
+                            }
+                        });
+                })(next++);
+            }
+        }
+
+        start();
+    }
+
     $.fn.bulkUpload = function(opts) {
         var options = $.extend({}, $.fn.bulkUpload.defaults, opts);
         var $this = $(this);
@@ -9,6 +149,29 @@
         $this.click(function() {
             var field = $this.data('field');
 
+            if (options.uploadUrl) {
+                var $chunkedFileInput = $('<input>')
+                    .attr('type', 'file')
+                    .attr('multiple', 'multiple');
+
+                $chunkedFileInput.change(function() {
+                    if (submitted || !this.files.length) {
+                        return;
+                    }
+
+                    if (options.submittingMessage) {
+                        $this.text(options.submittingMessage);
+                    }
+
+                    chunkedUploadAll(options, field, this.files, $this);
+
+                    submitted = true;
+                });
+
+                $chunkedFileInput.trigger('click');
+                return;
+            }
+
             var $form = $('<form>')
                 .attr('method', 'POST')
                 .attr('action', '')
@@ -90,6 +253,356 @@
         continueName: '_continue',
         continue: true,
         submittingMessage: 'Files are being uploaded...',
+        failedMessage: 'Some files could not be uploaded.',
+        uploadUrl: '',
+        chunkSize: 2 * 1024 * 1024,
+        parallelUploads: 3,
+        retries: 5,
+        retryDelay: 1000,
     };
 
+    function setFieldValue($row, name, value) {
+        var $inputs = $row.find('[name="' + name + '"]');
+
+        $inputs.each(function() {
+            var $input = $(this);
+
+            if ($input.is(':file')) {
+                return;
+            } else if ($input.is(':checkbox')) {
+                // Multiple checkboxes share their name and are checked by value
+                $input.prop('checked', $.isArray(value) ? $.inArray($input.val(), value) !== -1 : !!value);
+            } else if ($input.is(':radio')) {
+                $input.prop('checked', $input.val() === String(value));
+            } else if ($input.is('select')) {
+                $.each([].concat(value === null ? [] : value), function(i, item) {
+                    if (!$input.find('option').filter(function() { return this.value === item; }).length) {
+                        $input.append(new Option(item, item));
+                    }
+                });
+                $input.val(value);
+            } else {
+                $input.val(value === null ? '' : value);
+            }
+
+            // The values are the initial ones, which changed rows are compared to
+            if ($input.is('select')) {
+                $input.find('option').each(function() {
+                    this.defaultSelected = this.selected;
+                });
+            } else {
+                this.defaultValue = this.value;
+                this.defaultChecked = this.checked;
+            }
+        });
+    }
+
+    function renumber($row, prefix, index) {
+        var pattern = new RegExp('(' + prefix + '-)(\\d+|__prefix__|bulk\\d+)(?=-)');
+
+        $row.attr('id', prefix + '-' + index);
+        $row.find('*').addBack().each(function() {
+            var element = this;
+            $.each(['name', 'id', 'for'], function(i, attr) {
+                if (element.getAttribute && element.getAttribute(attr)) {
+                    element.setAttribute(attr, element.getAttribute(attr).replace(pattern, '$1' + index));
+                }
+            });
+        });
+    }
+
+    // Builds the rows of the bulk formset from JSON data, batch by batch while scrolling.
+    // Only the built rows are submitted.
+    $.fn.bulkRows = function(opts) {
+        var options = $.extend({}, $.fn.bulkRows.defaults, opts);
+        var data = JSON.parse($(this).text());
+        var prefix = data.prefix;
+        var $template = $('#' + prefix + '-empty');
+        var $insertBefore = $('#' + prefix + '-0').length ? $('#' + prefix + '-0') : $template;
+        var $form = $template.closest('form');
+        var rendered = 0;
+        var $more = $template.clone().empty().removeClass('empty-form').removeAttr('id').addClass('bulk-rows-more');
+        var $moreLink = $('<a href="#">').text(options.showMoreMessage);
+
+        if ($more.is('tr')) {
+            $more.append($('<td>').attr('colspan', $template.children().length).append($moreLink));
+        } else {
+            $more.append($moreLink);
+        }
+
+        function renderRow(values, index) {
+            var $row = $template.clone(true);
+            var name = prefix + '-bulk' + index;
+
+            $row.removeClass('empty-form').addClass('bulk-row has_original');
+            renumber($row, prefix, 'bulk' + index);
+            $row.find('td.original').prepend($('<p>').text(values[0]));
+
+            $.each(data.fields, function(i, field) {
+                setFieldValue($row, name + '-' + field, values[i + 1]);
+            });
+
+            if (data.can_delete) {
+                var $delete = $row.find('.delete');
+                if (!$delete.length) {
+                    $delete = $row.children().last();
+                }
+                $delete.empty().append($('<input type="checkbox">').attr('name', name + '-DELETE').attr('id', 'id_' + name + '-DELETE'));
+            }
+
+            $row.insertBefore($insertBefore);
+        }
+
+        function renderBatch() {
+            var end = Math.min(rendered + data.batch_size, data.rows.length);
+
+            for (; rendered < end; rendered++) {
+                renderRow(data.rows[rendered], rendered);
+            }
+
+            if (rendered < data.rows.length) {
+                $more.insertBefore($insertBefore);
+            } else {
+                $more.remove();
+                $(window).off('scroll.bulkRows');
+            }
+        }
+
+        $moreLink.click(function(event) {
+            event.preventDefault();
+            renderBatch();
+        });
+
+        $(window).on('scroll.bulkRows', function() {
+            if ($more.parent().length && $(window).scrollTop() + $(window).height() > $more.offset().top - options.threshold) {
+                renderBatch();
+            }
+        });
+
+        $form.submit(function() {
+            var $rows = $template.siblings('.bulk-row');
+            var $otherRows = $template.siblings('[id^="' + prefix + '-"]').not('.bulk-row');
+
+            $rows.add($otherRows).each(function(index) {
+                renumber($(this), prefix, index);
+            });
+
+            $('#id_' + prefix + '-INITIAL_FORMS').val($rows.length);
+            $('#id_' + prefix + '-TOTAL_FORMS').val($rows.length + $otherRows.length);
+        });
+
+        renderBatch();
+
+        return this;
+    };
+
+    $.fn.bulkRows.defaults = {
+        showMoreMessage: 'Show more',
+        threshold: 200,
+    };
+
+    function isChanged(element) {
+        if (element.type === 'file') {
+            return !!(element.files && element.files.length);
+        } else if (element.type === 'checkbox' || element.type === 'radio') {
+            return element.checked !== element.defaultChecked;
+        } else if (element.options) {
+            for (var i = 0; i < element.options.length; i++) {
+                if (element.options[i].selected !== element.options[i].defaultSelected) {
+                    return true;
+                }
+            }
+            return false;
+        } else if (element.type === 'submit' || element.type === 'button') {
+            return false;
+        }
+        return element.value !== element.defaultValue;
+    }
+
+    // Submits only the rows of the bulk form, whose fields differ from their initial values.
+    // The primary keys of the unchanged existing objects are submitted as prefix-UNCHANGED.
+    $.fn.bulkChangedRows = function(opts) {
+        var options = $.extend({}, $.fn.bulkChangedRows.defaults, opts);
+        var $form = $(this);
+        var prefix = options.prefix;
+        var $template = $('#' + prefix + '-empty');
+        var rowPattern = new RegExp('^' + prefix + '-(\\d+|bulk\\d+)$');
+        var $unchanged = $form.find('[name="' + prefix + '-UNCHANGED"]');
+
+        if (!$unchanged.length) {
+            $unchanged = $('<input type="hidden">').attr('name', prefix + '-UNCHANGED').appendTo($form);
+        }
+
+        function enable() {
+            $form.find('[data-bulk-unchanged]').prop('disabled', false).removeAttr('data-bulk-unchanged');
+        }
+
+        // Restored pages keep the disabled fields otherwise
+        $(window).on('pageshow', enable);
+
+        $form.submit(function(event) {
+            if (event.isDefaultPrevented()) {
+                return;
+            }
+
+            enable();
+
+            var $rows = $template.siblings().filter(function() {
+                return rowPattern.test(this.id);
+            });
+            var unchangedPks = [];
+            var initialCount = 0;
+            var totalCount = 0;
+
+            $rows.each(function() {
+                var $row = $(this);
+                var $inputs = $row.find(':input');
+                var pk = $inputs.filter('[name$="-' + options.pkName + '"]').val();
+
+                if ($inputs.filter(function() { return isChanged(this); }).length) {
+                    renumber($row, prefix, totalCount++);
+                    if (pk) {
+                        initialCount++;
+                    }
+                } else {
+                    $inputs.filter(':enabled').prop('disabled', true).attr('data-bulk-unchanged', '');
+                    if (pk) {
+                        unchangedPks.push(pk);
+                    }
+                }
+            });
+
+            $unchanged.val(unchangedPks.join(','));
+            $('#id_' + prefix + '-INITIAL_FORMS').val(initialCount);
+            $('#id_' + prefix + '-TOTAL_FORMS').val(totalCount);
+        });
+
+        return this;
+    };
+
+    $.fn.bulkChangedRows.defaults = {
+        prefix: 'form',
+        pkName: 'id',
+    };
+
+    // Submits the bulk form in the background and polls the job until it is saved.
+    // If the job fails or the forms are invalid, the form is submitted again as usual to show the errors.
+    $.fn.bulkJob = function(opts) {
+        var options = $.extend({}, $.fn.bulkJob.defaults, opts);
+        var $form = $(this);
+        var $submitter = null;
+        var background = true;
+
+        $form.find(':submit').click(function() {
+            $submitter = $(this);
+        });
+
+        $form.submit(function(event) {
+            var hasFiles = $form.find(':file').filter(function() {
+                return this.files && this.files.length;
+            }).length;
+
+            if (!background || event.isDefaultPrevented() || hasFiles) {
+                return;
+            }
+
+            if ($submitter && $.inArray($submitter.attr('name'), options.requestNames) >= 0) {
+                return;
+            }
+
+            event.preventDefault();
+
+            var data = $form.serializeArray();
+            var $message = $('<p class="bulk-job-message">').text(options.submittingMessage);
+
+            if ($submitter && $submitter.attr('name')) {
+                data.push({name: $submitter.attr('name'), value: $submitter.val()});
+            }
+
+            $message.insertBefore($form.find('.submit-row').first());
+            $form.find(':submit').prop('disabled', true);
+
+            function submitInRequest() {
+                background = false;
+                $message.remove();
+                $form.find(':submit').prop('disabled', false);
+
+                if ($submitter) {
+                    $submitter.click();
+                } else {
+                    $form.submit();
+                }
+            }
+
+            function poll(url) {
+                $.ajax({url: url, type: 'GET', dataType: 'json'})
+                    .done(function(job) {
+                        if (job.status === 'done') {
+                            window.location.href = job.redirect_url;
+                        } else if (job.status === 'invalid' || job.status === 'failed') {
+                            submitInRequest();
+                        } else {
+                            $message.text(options.submittingMessage + ' (' + job.processed + '/' + job.total + ')');
+                            setTimeout(function() { poll(url); }, options.interval);
+                        }
+                    })
+                    .fail(function() {
+                        setTimeout(function() { poll(url); }, options.interval);
+                    });
+            }
+
+            $.ajax({url: $form.attr('action') || window.location.href, type: 'POST', data: $.param(data), dataType: 'json'})
+                .done(function(job) {
+                    poll(job.status_url);
+                })
+                .fail(submitInRequest);
+        });
+
+        return this;
+    };
+
+    $.fn.bulkJob.defaults = {
+        submittingMessage: 'Saving...',
+        requestNames: ['_continue', '_nextwindow'],
+        interval: 1000,
+    };
+
+    // Selects rendered with only their selected options get the shared choices on first use
+    $(function() {
+        var $sharedChoices = $('#bulk-shared-choices');
+
+        if (!$sharedChoices.length) {
+            return;
+        }
+
+        var sharedChoices = JSON.parse($sharedChoices.text());
+
+        $(document).on('focus mousedown', 'select[data-bulk-choices]', function() {
+            var $select = $(this);
+            var choices = sharedChoices[$select.data('bulk-choices')];
+
+            if (!choices || $select.data('bulk-choices-loaded')) {
+                return;
+            }
+
+            var selected = {};
+            $.each([].concat($select.val() || []), function(i, value) {
+                selected[value] = true;
+            });
+
+            var fragment = document.createDocumentFragment();
+            $select.find('option[value=""]').each(function() {
+                fragment.appendChild(this);
+            });
+
+            for (var i = 0; i < choices.length; i++) {
+                var option = new Option(choices[i][1], choices[i][0], !!selected[choices[i][0]], !!selected[choices[i][0]]);
+                fragment.appendChild(option);
+            }
+
+            $select.empty().append(fragment);
+            $select.data('bulk-choices-loaded', true);
+        });
+    });
+
 })(django.jQuery);
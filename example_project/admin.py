@@ -13,10 +13,12 @@ class ProjectInline(bulk_admin.StackedBulkInlineModelAdmin):
 
 @admin.register(models.Image)
 class ImageAdmin(bulk_admin.BulkModelAdmin):
+    actions = ['bulk_edit_action', 'bulk_update_action', 'bulk_export_csv_action', 'bulk_export_json_action']
     search_fields = ('title',)
 
 
 @admin.register(models.Project)
 class ProjectAdmin(bulk_admin.BulkModelAdmin):
+    actions = ['bulk_edit_action', 'bulk_update_action', 'bulk_export_csv_action', 'bulk_export_json_action']
     raw_id_fields = ('images',)
     bulk_inline = ProjectInline
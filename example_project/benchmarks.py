@@ -0,0 +1,287 @@
+"""
+Benchmarks of bulk add, edit, upload and select with the example models.
+
+Every scenario is run for each number of rows within a transaction, which
+is rolled back afterwards. The latency, the number of queries, the peak
+memory (with tracemalloc only) and the size of the response are reported.
+
+Run them with ``./manage.py bulk_benchmark``.
+"""
+
+from __future__ import unicode_literals
+
+from collections import OrderedDict
+from contextlib import contextmanager
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.signals import request_started
+from django.core.urlresolvers import reverse
+from django.db import reset_queries, transaction
+from django.test.utils import override_settings
+from django.utils import six
+
+from bulk_admin.admin import BulkModelAdmin, BulkTimings, TabularBulkInlineModelAdmin
+from example_project.models import Image
+from example_project.utils import override_admin
+
+import django
+import timeit
+
+try:
+    import tracemalloc
+except ImportError:  # Python < 3.4
+    tracemalloc = None
+
+
+SIZES = (10, 100, 1000, 10000)
+
+
+class ImageInline(TabularBulkInlineModelAdmin):
+    # Formsets ignore the forms above max_num + 1000
+    max_num = 2 * max(SIZES)
+    validate_unique_in_bulk = True
+
+
+def _url(name):
+    return reverse('admin:{}_{}_{}'.format(Image._meta.app_label, Image._meta.model_name, name))
+
+
+def _post_and_follow(client, url, payload):
+    # The page redirected to is part of the request as seen by the user
+    response = client.post(url, payload)
+
+    if response.status_code == 302:
+        return client.get(response['Location'])
+
+    return response
+
+
+def _create_images(size):
+    Image.objects.bulk_create(Image(title='image {}'.format(index)) for index in range(size))
+    return list(Image.objects.order_by('pk').values_list('pk', flat=True))
+
+
+def _bulk_add(client, size):
+    payload = {
+        'form-TOTAL_FORMS': size,
+        'form-INITIAL_FORMS': 0,
+    }
+    payload.update(('form-{}-title'.format(index), 'new {}'.format(index)) for index in range(size))
+
+    return lambda: _post_and_follow(client, _url('bulk'), payload)
+
+
+def _bulk_edit(client, size):
+    pks = _create_images(size)
+    payload = {
+        'form-TOTAL_FORMS': size,
+        'form-INITIAL_FORMS': size,
+    }
+
+    for index, pk in enumerate(pks):
+        payload['form-{}-id'.format(index)] = pk
+        payload['form-{}-title'.format(index)] = 'changed {}'.format(index)
+
+    return lambda: _post_and_follow(client, _url('bulk'), payload)
+
+
+def _bulk_edit_action(client, size):
+    pks = _create_images(size)
+    payload = {
+        'action': 'bulk_edit_action',
+        'index': 0,
+        '_selected_action': pks,
+    }
+
+    return lambda: _post_and_follow(client, _url('changelist'), payload)
+
+
+def _bulk_upload(client, size):
+    files = [SimpleUploadedFile('benchmark-{}.txt'.format(index), b'data') for index in range(size)]
+
+    def request():
+        for uploaded_file in files:
+            uploaded_file.seek(0)
+
+        return client.post(_url('bulk'), {
+            'form-TOTAL_FORMS': size,
+            'form-INITIAL_FORMS': 0,
+            'form-data': files,
+        })
+
+    return request
+
+
+def _select_related_action(client, size):
+    pks = _create_images(size)
+    payload = {
+        'action': 'select_related_action',
+        'index': 0,
+        '_selected_action': pks,
+    }
+
+    return lambda: client.post('{}?_popup=1'.format(_url('changelist')), payload)
+
+
+# Name: (prepare, admin attributes, allowed additional queries per additional row)
+SCENARIOS = OrderedDict([
+    # Without admin log, the new objects are bulk inserted, even if the backend doesn't return their primary keys
+    ('bulk_add', (_bulk_add, {'bulk_save_mode': 'batched', 'bulk_log_entries': False, 'bulk_inline': ImageInline}, 0.01)),
+    ('bulk_edit', (_bulk_edit, {'bulk_save_mode': 'batched', 'bulk_inline': ImageInline}, 0.01)),
+    ('bulk_edit_action', (_bulk_edit_action, {'bulk_inline': ImageInline}, 0)),
+    # Uploaded objects are edited again with the generated titles, so their primary keys are needed. Backends
+    # which don't return the primary keys of bulk inserted rows (all of them on Django < 1.10) insert them one by one.
+    ('bulk_upload', (_bulk_upload, {'bulk_save_mode': 'batched', 'bulk_log_entries': False, 'bulk_inline': ImageInline}, 1)),
+    ('select_related_action', (_select_related_action, {}, 0)),
+])
+
+
+@contextmanager
+def _request_settings():
+    # Django >= 1.10 limits the number of fields of a request
+    if django.VERSION < (1, 10):
+        yield
+        return
+
+    with override_settings(DATA_UPLOAD_MAX_NUMBER_FIELDS=None):
+        yield
+
+
+def _measure(client, prepare, size, trace_memory):
+    with transaction.atomic():
+        request = prepare(client, size)
+        timings = BulkTimings('default')
+
+        if trace_memory:
+            tracemalloc.start()
+
+        # The queries of all requests of a scenario are counted
+        request_started.disconnect(reset_queries)
+
+        try:
+            with timings.counting_queries():
+                start = timeit.default_timer()
+                response = request()
+                latency = timeit.default_timer() - start
+                queries = timings.get_query_count()
+        finally:
+            request_started.connect(reset_queries)
+            memory = tracemalloc.get_traced_memory()[1] if trace_memory else None
+            if trace_memory:
+                tracemalloc.stop()
+            _delete_uploaded_files()
+
+        if response.status_code >= 400:
+            raise AssertionError('{} rows: status {}'.format(size, response.status_code))
+
+        if response.streaming:
+            response_size = sum(len(chunk) for chunk in response.streaming_content)
+        else:
+            response_size = len(response.content)
+
+        transaction.set_rollback(True)
+
+    return {
+        'latency': latency,
+        'queries': queries,
+        'memory': memory,
+        'response_size': response_size,
+    }
+
+
+def _delete_uploaded_files():
+    # Files aren't removed from storage by the rollback, nor are the files of failed requests referenced by images
+    storage = Image._meta.get_field('data').storage
+
+    if not storage.exists(''):
+        return
+
+    directories, files = storage.listdir('')
+
+    for name in files:
+        if name.startswith('benchmark-'):
+            storage.delete(name)
+
+
+def run_benchmarks(client, sizes=SIZES, scenarios=None, repeat=1):
+    """
+    Runs the *scenarios* (all by default) with the logged in *client* for
+    every number of rows in *sizes*. Returns the results by scenario and
+    number of rows. The latency is the best of *repeat* runs, the memory is
+    measured in an additional run.
+    """
+    results = OrderedDict()
+
+    for name in scenarios or SCENARIOS:
+        prepare, attrs, scaling = SCENARIOS[name]
+        results[name] = OrderedDict()
+
+        with override_admin(Image, **attrs), _request_settings():
+            for size in sizes:
+                runs = [_measure(client, prepare, size, False) for run in range(repeat)]
+                result = min(runs, key=lambda run: run['latency'])
+
+                if tracemalloc is not None:
+                    result['memory'] = _measure(client, prepare, size, True)['memory']
+
+                results[name][six.text_type(size)] = result
+
+    return results
+
+
+def check_scaling(results):
+    """
+    Returns the scenarios whose number of queries grows with the number of
+    rows more than the additional queries per additional row allowed by
+    SCENARIOS, plus one query for a partial batch and one query per
+    additional chunk of bulk_lookup_batch_size objects looked up.
+    """
+    failures = []
+
+    for name, sizes in six.iteritems(results):
+        attrs, per_row = SCENARIOS[name][1:]
+        lookup_batch_size = attrs.get('bulk_lookup_batch_size', BulkModelAdmin.bulk_lookup_batch_size)
+
+        if len(sizes) < 2:
+            continue
+
+        ordered = sorted(sizes.items(), key=lambda item: int(item[0]))
+        (smallest, first), (largest, last) = ordered[0], ordered[-1]
+        allowed = int(per_row * (int(largest) - int(smallest))) + (1 if per_row else 0)
+        # Selections and bulk forms are looked up in chunks
+        allowed += _chunk_count(int(largest), lookup_batch_size) - _chunk_count(int(smallest), lookup_batch_size)
+
+        if last['queries'] - first['queries'] > allowed:
+            failures.append('{}: {} queries for {} rows, {} queries for {} rows'.format(
+                name, first['queries'], smallest, last['queries'], largest
+            ))
+
+    return failures
+
+
+def _chunk_count(size, batch_size):
+    return (size + batch_size - 1) // batch_size
+
+
+def compare_to_baseline(results, baseline, tolerance):
+    """
+    Returns the regressions of *results* against the *baseline* results:
+    more queries, or a latency, memory or response size growing by more
+    than the *tolerance* factor.
+    """
+    regressions = []
+
+    for name, sizes in six.iteritems(results):
+        for size, result in six.iteritems(sizes):
+            expected = baseline.get(name, {}).get(size)
+
+            if expected is None:
+                continue
+
+            if result['queries'] > expected['queries']:
+                regressions.append('{} ({} rows): {} queries instead of {}'.format(name, size, result['queries'], expected['queries']))
+
+            for metric in ('latency', 'memory', 'response_size'):
+                if result[metric] is not None and expected.get(metric) and result[metric] > expected[metric] * (1 + tolerance):
+                    regressions.append('{} ({} rows): {} {} instead of {}'.format(name, size, metric, result[metric], expected[metric]))
+
+    return regressions
@@ -0,0 +1,75 @@
+from __future__ import unicode_literals
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.runner import DiscoverRunner
+
+from example_project import benchmarks
+
+import json
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks bulk add, edit, upload and select within a test database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default=','.join(str(size) for size in benchmarks.SIZES),
+                            help='Comma separated numbers of rows.')
+        parser.add_argument('--scenarios', default=','.join(benchmarks.SCENARIOS),
+                            help='Comma separated scenarios.')
+        parser.add_argument('--repeat', type=int, default=1,
+                            help='Number of runs to take the best latency of.')
+        parser.add_argument('--baseline',
+                            help='JSON file of results to compare against.')
+        parser.add_argument('--save-baseline',
+                            help='JSON file to save the results to.')
+        parser.add_argument('--tolerance', type=float, default=0.5,
+                            help='Allowed growth of latency, memory and response size against the baseline.')
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        scenarios = options['scenarios'].split(',')
+
+        for name in scenarios:
+            if name not in benchmarks.SCENARIOS:
+                raise CommandError('Unknown scenario {}'.format(name))
+
+        runner = DiscoverRunner(verbosity=0, interactive=False)
+        runner.setup_test_environment()
+        old_config = runner.setup_databases()
+
+        try:
+            User.objects.create_superuser('benchmark', 'benchmark@example.com', 'benchmark')
+            client = Client()
+            client.login(username='benchmark', password='benchmark')
+
+            results = benchmarks.run_benchmarks(client, sizes, scenarios, options['repeat'])
+        finally:
+            runner.teardown_databases(old_config)
+            runner.teardown_test_environment()
+
+        self.report(results)
+
+        if options['save_baseline']:
+            with open(options['save_baseline'], 'w') as baseline_file:
+                json.dump(results, baseline_file, indent=2)
+
+        failures = benchmarks.check_scaling(results)
+
+        if options['baseline']:
+            with open(options['baseline']) as baseline_file:
+                failures.extend(benchmarks.compare_to_baseline(results, json.load(baseline_file), options['tolerance']))
+
+        if failures:
+            raise CommandError('\n'.join(failures))
+
+    def report(self, results):
+        self.stdout.write('{:<24}{:>8}{:>12}{:>10}{:>14}{:>14}'.format('scenario', 'rows', 'latency', 'queries', 'memory', 'response'))
+
+        for name, sizes in results.items():
+            for size, result in sizes.items():
+                self.stdout.write('{:<24}{:>8}{:>11.3f}s{:>10}{:>14}{:>14}'.format(
+                    name, size, result['latency'], result['queries'],
+                    result['memory'] if result['memory'] is not None else '-', result['response_size']
+                ))
@@ -17,6 +17,7 @@ class Image(models.Model):
 class Project(models.Model):
     title = models.CharField(max_length=255, unique=True)
     images = models.ManyToManyField(Image, blank=True)
+    cover = models.ForeignKey(Image, null=True, blank=True, on_delete=models.PROTECT, related_name='covered_projects')
 
     def __str__(self):
         return self.title
@@ -1,22 +1,41 @@
 from __future__ import unicode_literals
 
-from django.test import TestCase
+from django import forms
+from django.db import IntegrityError, connection
+from django.db.models.signals import m2m_changed
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.contrib.admin.models import ADDITION, LogEntry
 from django.contrib.admin.sites import site as admin_site
+from django.contrib.admin.widgets import AdminSplitDateTime
 from django.contrib.auth.models import Permission, User
+from django.core.exceptions import ValidationError
 from django.core.urlresolvers import reverse
+from django.forms.models import modelformset_factory
 from django.utils import six
 from io import BytesIO
 
-from bulk_admin.admin import BulkInlineModelAdmin
+from bulk_admin.admin import BulkInlineModelAdmin, BulkModelFormSet, TabularBulkInlineModelAdmin
+from bulk_admin.signals import bulk_view_timed
+from example_project.benchmarks import SCENARIOS, check_scaling, compare_to_baseline, run_benchmarks
 from example_project.models import Image, Project
+from example_project.utils import override_admin
 
+import datetime
+import json
+import os
+import re
 import sys
+import threading
+import time
 
 
 class BulkTests(TestCase):
 
     def setUp(self):
         self.bulk_url = reverse('admin:{}_{}_bulk'.format(Image._meta.app_label, Image._meta.model_name))
+        self.bulk_upload_url = reverse('admin:{}_{}_bulk_upload'.format(Image._meta.app_label, Image._meta.model_name))
+        self.bulk_import_url = reverse('admin:{}_{}_bulk_import'.format(Image._meta.app_label, Image._meta.model_name))
         self.changelist_url = reverse('admin:{}_{}_changelist'.format(Image._meta.app_label, Image._meta.model_name))
         self.add_url = reverse('admin:{}_{}_add'.format(Image._meta.app_label, Image._meta.model_name))
         self.index_url = reverse('admin:index')
@@ -126,6 +145,237 @@ class BulkTests(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertImagesEqual(self.getResponseQueryset(response), [])
 
+    def test_bulk_edit_action(self):
+        foo = Image.objects.create(title='foo')
+        Image.objects.create(title='bar')
+        baz = Image.objects.create(title='baz')
+
+        response = self.client.post(self.changelist_url, {
+            'action': 'bulk_edit_action',
+            'index': 0,
+            '_selected_action': [foo.pk, baz.pk],
+        })
+
+        self.assertEqual(response.status_code, 302)
+        self.assertNotIn('pks=', response['Location'])
+
+        response = self.client.get(response['Location'])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertImagesEqual(self.getResponseQueryset(response).order_by('pk'), [foo, baz])
+
+    def test_bulk_edit_action_with_lookup_batches(self):
+        images = [Image.objects.create(title='foo {}'.format(index)) for index in range(3)]
+
+        with override_admin(Image, bulk_lookup_batch_size=2, bulk_window_size=2):
+            response = self.client.post(self.changelist_url, {
+                'action': 'bulk_edit_action',
+                'index': 0,
+                '_selected_action': [image.pk for image in images],
+            })
+
+            with CaptureQueriesContext(connection) as queries:
+                first = self.client.get(response['Location'])
+
+            last = self.client.get('{}&after={}'.format(response['Location'], images[1].pk))
+
+        selects = [query for query in queries.captured_queries if 'SELECT' in query['sql'] and '"example_project_image"."id" IN' in query['sql']]
+
+        self.assertEqual(len(selects), 2)
+        self.assertImagesEqual(self.getResponseQueryset(first), images[:2])
+        self.assertTrue(first.context['bulk_window_has_next'])
+        self.assertImagesEqual(self.getResponseQueryset(last), images[2:])
+        self.assertFalse(last.context['bulk_window_has_next'])
+
+    def test_bulk_edit_action_select_across(self):
+        foo = Image.objects.create(title='foo')
+        Image.objects.create(title='bar')
+        foobar = Image.objects.create(title='foobar')
+
+        response = self.client.post('{}?q=foo'.format(self.changelist_url), {
+            'action': 'bulk_edit_action',
+            'index': 0,
+            'select_across': 1,
+            '_selected_action': [foo.pk],
+        })
+
+        self.assertEqual(response.status_code, 302)
+
+        Image.objects.create(title='foobaz')
+        response = self.client.get(response['Location'])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertImagesEqual(
+            self.getResponseQueryset(response).order_by('pk'),
+            [foo, foobar, Image.objects.get(title='foobaz')]
+        )
+
+    def test_bulk_export_csv_action(self):
+        foo = Image.objects.create(title='foo')
+        Image.objects.create(title='bar')
+        baz = Image.objects.create(title='baz, "quoted"')
+
+        with override_admin(Image, bulk_export_chunk_size=1):
+            response = self.client.post(self.changelist_url, {
+                'action': 'bulk_export_csv_action',
+                'index': 0,
+                '_selected_action': [foo.pk, baz.pk],
+            })
+
+        content = b''.join(response.streaming_content).decode('utf-8')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(content.splitlines(), [
+            'id,title,data',
+            '{},foo,'.format(foo.pk),
+            '{},"baz, ""quoted""",'.format(baz.pk),
+        ])
+
+    def test_bulk_export_json_action(self):
+        images = [Image.objects.create(title='image {}'.format(index)) for index in range(2)]
+        project = Project.objects.create(title='project', cover=images[0])
+        project.images.add(*images)
+        project_changelist_url = reverse('admin:{}_{}_changelist'.format(Project._meta.app_label, Project._meta.model_name))
+        self.user.is_superuser = True
+        self.user.save()
+
+        response = self.client.post(project_changelist_url, {
+            'action': 'bulk_export_json_action',
+            'index': 0,
+            'select_across': 1,
+            '_selected_action': [project.pk],
+        })
+
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode('utf-8').splitlines()]
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(rows, [{
+            'id': project.pk,
+            'title': 'project',
+            'images': [image.pk for image in images],
+            'cover': images[0].pk,
+        }])
+
+    def test_bulk_update_action(self):
+        images = [Image.objects.create(title='image {}'.format(index)) for index in range(2)]
+        projects = [Project.objects.create(title='project {}'.format(index), cover=images[0]) for index in range(4)]
+        project_changelist_url = reverse('admin:{}_{}_changelist'.format(Project._meta.app_label, Project._meta.model_name))
+        selected = [project.pk for project in projects[:3]]
+        self.user.is_superuser = True
+        self.user.save()
+
+        response = self.client.post(project_changelist_url, {
+            'action': 'bulk_update_action',
+            'index': 0,
+            '_selected_action': selected,
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context['form'].fields), ['cover'])
+        self.assertEqual(response.context['count'], 3)
+
+        with override_admin(Project, bulk_save_batch_size=2):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(project_changelist_url, {
+                    'action': 'bulk_update_action',
+                    '_selected_action': selected,
+                    '_bulk_update': 1,
+                    '_bulk_update_fields': ['cover'],
+                    'bulk_update-cover': images[1].pk,
+                })
+
+        updates = [query for query in queries.captured_queries if 'UPDATE "example_project_project"' in query['sql']]
+
+        self.assertRedirects(response, project_changelist_url)
+        self.assertEqual(len(updates), 2)
+        self.assertEqual([project.cover for project in Project.objects.order_by('pk')], [images[1]] * 3 + [images[0]])
+        self.assertEqual(LogEntry.objects.filter(object_id__in=[str(pk) for pk in selected]).count(), 3)
+
+    def test_bulk_update_action_with_errors(self):
+        image = Image.objects.create(title='image')
+        project = Project.objects.create(title='project', cover=image)
+        project_changelist_url = reverse('admin:{}_{}_changelist'.format(Project._meta.app_label, Project._meta.model_name))
+        self.user.is_superuser = True
+        self.user.save()
+
+        response = self.client.post(project_changelist_url, {
+            'action': 'bulk_update_action',
+            '_selected_action': [project.pk],
+            '_bulk_update': 1,
+            '_bulk_update_fields': ['cover'],
+            'bulk_update-cover': image.pk + 1,
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['form'].errors['cover'])
+        self.assertEqual(Project.objects.get().cover, image)
+
+    def test_http_get_bulk_with_unknown_selection(self):
+        Image.objects.create(title='foo')
+
+        response = self.client.get('{}?selection=unknown'.format(self.bulk_url))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertImagesEqual(self.getResponseQueryset(response), [])
+
+    def test_http_get_bulk_windowed(self):
+        images = [Image.objects.create(title='foo {}'.format(index)) for index in range(5)]
+        pks = ','.join(str(image.pk) for image in images)
+
+        with override_admin(Image, bulk_window_size=2):
+            first = self.client.get('{}?pks={}'.format(self.bulk_url, pks))
+            last = self.client.get('{}?pks={}&after={}'.format(self.bulk_url, pks, images[3].pk))
+
+        self.assertImagesEqual(self.getResponseQueryset(first), images[:2])
+        self.assertTrue(first.context['bulk_window_has_next'])
+        self.assertImagesEqual(self.getResponseQueryset(last), images[4:])
+        self.assertFalse(last.context['bulk_window_has_next'])
+
+    def test_change_image_and_edit_next_window(self):
+        foo = Image.objects.create(title='foo')
+        bar = Image.objects.create(title='bar')
+        url = '{}?pks={},{}'.format(self.bulk_url, foo.pk, bar.pk)
+
+        with override_admin(Image, bulk_window_size=1):
+            payload = self.bulk_payload([{'title': 'foo changed', 'id': foo.id}], _nextwindow=1)
+            first = self.client.post(url, payload)
+
+            payload = self.bulk_payload([{'title': 'bar changed', 'id': bar.id}], _nextwindow=1)
+            last = self.client.post('{}&after={}'.format(url, foo.pk), payload)
+
+        self.assertRedirects(first, '{}&after={}'.format(url, foo.pk))
+        self.assertRedirects(last, self.changelist_url)
+        self.assertImagesEqual(self.getTestQueryset().order_by('pk'), [{'title': 'foo changed'}, {'title': 'bar changed'}])
+
+    def test_http_get_bulk_with_json_rows(self):
+        foo = Image.objects.create(title='foo')
+        bar = Image.objects.create(title='bar <b>')
+
+        with override_admin(Image, bulk_render_mode='json'):
+            response = self.client.get('{}?pks={},{}'.format(self.bulk_url, foo.pk, bar.pk))
+
+        rows = json.loads(response.context['bulk_rows'])
+        title_index = rows['fields'].index('title') + 1
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['inline_admin_formsets'][0].formset.initial_forms), 0)
+        self.assertEqual(sorted(row[title_index] for row in rows['rows']), ['bar <b>', 'foo'])
+        self.assertNotContains(response, 'bar <b>')
+
+    def test_json_rows_with_multi_widgets(self):
+        class ImageForm(forms.ModelForm):
+            taken = forms.SplitDateTimeField(widget=AdminSplitDateTime, initial=datetime.datetime(2015, 3, 1, 12, 30))
+
+        Image.objects.create(title='foo')
+        formset_class = modelformset_factory(Image, form=ImageForm, fields=['title'], extra=0)
+        formset = formset_class(queryset=Image.objects.all())
+
+        rows = admin_site._registry[Image].get_bulk_rows(RequestFactory().get(self.bulk_url), formset)
+        values = dict(zip(rows['fields'], rows['rows'][0][1:]))
+
+        self.assertNotIn('taken', values)
+        self.assertEqual((values['taken_0'], values['taken_1']), ('2015-03-01', '12:30:00'))
+
     def test_http_get_bulk_not_staff(self):
         self.client.login(username='not_staff', password='not_staff')
 
@@ -230,6 +480,106 @@ class BulkTests(TestCase):
         self.assertImagesEqual(self.getTestQueryset(), images)
         self.assertImagesEqual(self.getResponseQueryset(response), images)
 
+    def test_change_image_and_continue_without_query_of_saved_images(self):
+        image = Image.objects.create(title='foo')
+        images = [{'title': 'bar', 'id': image.id}]
+        payload = self.bulk_payload(images, _continue=1)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.bulk_url, payload)
+
+        image_queries = [query for query in queries.captured_queries if 'SELECT "example_project_image"."id", "example_project_image"."title"' in query['sql']]
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(image_queries), 1)
+        self.assertImagesEqual(self.getResponseQueryset(response), images)
+
+    def test_change_images_and_continue_with_lookup_batches(self):
+        images = [Image.objects.create(title='foo {}'.format(index)) for index in range(5)]
+        images = [{'title': 'bar {}'.format(image.title), 'id': image.id} for image in reversed(images)]
+        payload = self.bulk_payload(images, _continue=1)
+
+        with override_admin(Image, bulk_lookup_batch_size=2):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(self.bulk_url, payload)
+
+        image_queries = [query for query in queries.captured_queries if 'SELECT "example_project_image"."id", "example_project_image"."title"' in query['sql']]
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(image_queries), 3)
+        self.assertImagesEqual(self.getTestQueryset().order_by('-pk'), images)
+        self.assertImagesEqual(self.getResponseQueryset(response), images)
+
+    def test_change_images_without_query_per_form(self):
+        images = [Image.objects.create(title='foo {}'.format(index)) for index in range(3)]
+        images = [{'title': 'bar {}'.format(image.title), 'id': image.id} for image in images]
+        payload = self.bulk_payload(images)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.bulk_url, payload)
+
+        pk_queries = [query for query in queries.captured_queries if '"example_project_image"."id" = ' in query['sql']]
+
+        self.assertRedirects(response, self.changelist_url)
+        self.assertEqual(pk_queries, [])
+        self.assertImagesEqual(self.getTestQueryset().order_by('pk'), images)
+
+    def test_change_image_outside_of_formset(self):
+        image = Image.objects.create(title='foo')
+        payload = self.bulk_payload([{'title': 'bar', 'id': image.id + 1}])
+
+        response = self.client.post(self.bulk_url, payload)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('id', response.context['inline_admin_formsets'][0].formset.errors[0])
+        self.assertImagesEqual(self.getTestQueryset(), [image])
+
+    def test_change_changed_image_and_continue(self):
+        image = Image.objects.create(title='foo')
+        unchanged_image = Image.objects.create(title='unchanged')
+        images = [{'title': 'bar', 'id': image.id}]
+        payload = self.bulk_payload(images, _continue=1, **{'form-UNCHANGED': str(unchanged_image.id)})
+        response = self.client.post(self.bulk_url, payload)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertImagesEqual(self.getTestQueryset().order_by('pk'), images + [unchanged_image])
+        self.assertImagesEqual(self.getResponseQueryset(response), images + [unchanged_image])
+        self.assertContains(response, 'name="form-UNCHANGED"', count=0)
+
+    def test_change_changed_image_with_invalid_unchanged_pks(self):
+        image = Image.objects.create(title='foo')
+        unchanged_image = Image.objects.create(title='unchanged')
+        images = [{'title': 'bar', 'id': image.id}]
+        payload = self.bulk_payload(images, _continue=1, **{'form-UNCHANGED': '{},foo'.format(unchanged_image.id)})
+        response = self.client.post(self.bulk_url, payload)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertImagesEqual(self.getResponseQueryset(response), images + [unchanged_image])
+
+    def test_change_changed_image_in_popup(self):
+        image = Image.objects.create(title='foo')
+        unchanged_image = Image.objects.create(title='unchanged')
+        images = [{'title': 'bar', 'id': image.id}]
+        payload = self.bulk_payload(images, _popup=1, **{'form-UNCHANGED': str(unchanged_image.id)})
+        response = self.client.post(self.bulk_url, payload)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['values'], [image.id, unchanged_image.id])
+
+    def test_change_changed_image_with_errors(self):
+        image = Image.objects.create(title='foo')
+        unchanged_image = Image.objects.create(title='unchanged')
+        images = [{'title': '', 'id': image.id}]
+
+        with override_admin(Image, bulk_submit_mode='changed'):
+            payload = self.bulk_payload(images, **{'form-UNCHANGED': str(unchanged_image.id)})
+            response = self.client.post(self.bulk_url, payload)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'name="form-UNCHANGED" value="{}"'.format(unchanged_image.id))
+        self.assertNotContains(response, 'bulkChangedRows(')
+        self.assertImagesEqual(self.getTestQueryset().order_by('pk'), [image, unchanged_image])
+
     def test_change_image_and_add_another(self):
         image = Image.objects.create(title='foo')
         images = [{'title': 'bar', 'id': image.id}]
@@ -259,6 +609,514 @@ class BulkTests(TestCase):
         self.assertRedirects(response, self.changelist_url)
         self.assertImagesEqual(self.getTestQueryset(), images)
 
+    def test_add_change_and_delete_images_with_log_entries(self):
+        foo = Image.objects.create(title='foo')
+        bar = Image.objects.create(title='bar')
+        images = [
+            {'title': 'foo changed', 'id': foo.id},
+            {'title': 'bar', 'id': bar.id, 'DELETE': True},
+            {'title': 'baz'},
+        ]
+        payload = self.bulk_payload(images)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.bulk_url, payload)
+
+        log_inserts = [query for query in queries.captured_queries if 'INSERT INTO "django_admin_log"' in query['sql']]
+        entries = {entry.object_id: entry for entry in LogEntry.objects.all()}
+
+        self.assertRedirects(response, self.changelist_url)
+        self.assertEqual(len(log_inserts), 1)
+        self.assertEqual(len(entries), 3)
+        self.assertTrue(entries[str(foo.pk)].is_change())
+        self.assertIn('title', entries[str(foo.pk)].change_message)
+        self.assertTrue(entries[str(bar.pk)].is_deletion())
+        self.assertEqual(entries[str(bar.pk)].object_repr, 'bar')
+        self.assertTrue(entries[str(Image.objects.get(title='baz').pk)].is_addition())
+
+    def test_add_images_without_log_entries(self):
+        payload = self.bulk_payload([{'title': 'foo'}])
+
+        with override_admin(Image, bulk_log_entries=False):
+            response = self.client.post(self.bulk_url, payload)
+
+        self.assertRedirects(response, self.changelist_url)
+        self.assertFalse(LogEntry.objects.exists())
+
+    def test_add_image_with_timings(self):
+        received = []
+
+        def receiver(sender, request, response, timings, **kwargs):
+            received.append(timings)
+
+        bulk_view_timed.connect(receiver)
+        payload = self.bulk_payload([{'title': 'foo'}, {'title': 'bar'}])
+
+        try:
+            with override_admin(Image, bulk_server_timing=True):
+                response = self.client.post(self.bulk_url, payload)
+        finally:
+            bulk_view_timed.disconnect(receiver)
+
+        phases = received[0].phases
+
+        self.assertRedirects(response, self.changelist_url)
+        self.assertEqual(list(phases), ['transform_queryset', 'transform_post_and_files', 'validate', 'write_files', 'save'])
+        self.assertEqual(phases['validate']['rows'], 2)
+        self.assertGreaterEqual(phases['save']['queries'], 2)
+        self.assertIn('save;dur=', response['Server-Timing'])
+
+    def test_show_images_with_timings(self):
+        Image.objects.create(title='foo')
+        received = []
+
+        def receiver(sender, request, response, timings, **kwargs):
+            received.append((response.is_rendered, timings))
+
+        bulk_view_timed.connect(receiver)
+
+        try:
+            with override_admin(Image, bulk_server_timing=True):
+                response = self.client.get(self.bulk_url)
+        finally:
+            bulk_view_timed.disconnect(receiver)
+
+        rendered, timings = received[0]
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(rendered)
+        self.assertEqual(list(timings.phases), ['inline_formsets', 'render'])
+        self.assertEqual(timings.phases['render']['rows'], timings.phases['inline_formsets']['rows'])
+        self.assertIn('render;dur=', response['Server-Timing'])
+
+    def test_benchmarks(self):
+        results = run_benchmarks(self.client, sizes=(2, 20))
+
+        self.assertEqual(list(results), list(SCENARIOS))
+
+        for sizes in results.values():
+            self.assertEqual(list(sizes), ['2', '20'])
+
+            for result in sizes.values():
+                self.assertGreater(result['queries'], 0)
+                self.assertGreater(result['response_size'], 0)
+
+        self.assertEqual(check_scaling(results), [])
+        self.assertEqual(compare_to_baseline(results, results, 0), [])
+        self.assertFalse(Image.objects.exists())
+
+    def test_add_image_and_save_batched(self):
+        images = [{'title': 'foo'}, {'title': 'bar'}, {'title': 'baz'}]
+        payload = self.bulk_payload(images)
+
+        with override_admin(Image, bulk_save_mode='batched', bulk_save_batch_size=2):
+            response = self.client.post(self.bulk_url, payload)
+
+        self.assertRedirects(response, self.changelist_url)
+        self.assertImagesEqual(self.getTestQueryset().order_by('pk'), images)
+
+    def test_add_image_and_save_batched_without_pks(self):
+        images = [{'title': 'foo'}, {'title': 'bar'}, {'title': 'baz'}]
+        payload = self.bulk_payload(images)
+
+        with override_admin(Image, bulk_save_mode='batched', bulk_save_batch_size=2, bulk_log_entries=False):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(self.bulk_url, payload)
+
+        inserts = [query for query in queries.captured_queries if 'INSERT INTO "example_project_image"' in query['sql']]
+
+        self.assertRedirects(response, self.changelist_url)
+        self.assertEqual(len(inserts), 2)
+        self.assertImagesEqual(self.getTestQueryset().order_by('pk'), images)
+
+    def test_add_image_and_continue_batched(self):
+        images = [{'title': 'foo'}, {'title': 'bar'}]
+        payload = self.bulk_payload(images, _continue=1)
+
+        with override_admin(Image, bulk_save_mode='batched'):
+            response = self.client.post(self.bulk_url, payload)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertImagesEqual(self.getResponseQueryset(response), images)
+
+    def test_change_and_delete_image_and_save_batched(self):
+        foo = Image.objects.create(title='foo')
+        bar = Image.objects.create(title='bar')
+        baz = Image.objects.create(title='baz')
+        images = [
+            {'title': 'foo changed', 'id': foo.id},
+            {'title': 'bar', 'id': bar.id, 'DELETE': True},
+            {'title': 'baz changed', 'id': baz.id},
+        ]
+        payload = self.bulk_payload(images)
+
+        with override_admin(Image, bulk_save_mode='batched', bulk_save_batch_size=1):
+            response = self.client.post(self.bulk_url, payload)
+
+        self.assertRedirects(response, self.changelist_url)
+        self.assertImagesEqual(self.getTestQueryset().order_by('pk'), [images[0], images[2]])
+
+    def test_change_project_images_and_save_batched(self):
+        images = [Image.objects.create(title='image {}'.format(index)) for index in range(3)]
+        projects = [Project.objects.create(title='project {}'.format(index)) for index in range(2)]
+        project_bulk_url = reverse('admin:{}_{}_bulk'.format(Project._meta.app_label, Project._meta.model_name))
+        through = Project.images.through
+        signals = []
+        self.user.is_superuser = True
+        self.user.save()
+
+        for project in projects:
+            project.images.add(images[0], images[1])
+
+        def receiver(sender, instance, action, pk_set, **kwargs):
+            signals.append((instance.title, action, pk_set))
+
+        payload = self.bulk_payload([
+            {'id': projects[0].id, 'title': 'project 0', 'images': '{},{}'.format(images[1].id, images[2].id)},
+            {'id': projects[1].id, 'title': 'project 1', 'images': '{},{}'.format(images[0].id, images[1].id)},
+            {'title': 'project 2', 'images': '{}'.format(images[2].id)},
+        ])
+
+        m2m_changed.connect(receiver, sender=through)
+
+        try:
+            with override_admin(Project, bulk_save_mode='batched'):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.post(project_bulk_url, payload)
+        finally:
+            m2m_changed.disconnect(receiver, sender=through)
+
+        through_queries = [
+            re.match(r'(?:QUERY = u?[\'"])?(\w+)', query['sql']).group(1)
+            for query in queries.captured_queries if '"example_project_project_images"' in query['sql']
+        ]
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(through_queries, ['SELECT', 'DELETE', 'INSERT'])
+        self.assertEqual([list(project.images.order_by('pk')) for project in Project.objects.order_by('pk')], [
+            [images[1], images[2]],
+            [images[0], images[1]],
+            [images[2]],
+        ])
+        self.assertEqual(signals, [
+            ('project 0', 'pre_remove', {images[0].id}),
+            ('project 0', 'post_remove', {images[0].id}),
+            ('project 0', 'pre_add', {images[2].id}),
+            ('project 2', 'pre_add', {images[2].id}),
+            ('project 0', 'post_add', {images[2].id}),
+            ('project 2', 'post_add', {images[2].id}),
+        ])
+
+    def test_change_images_and_save_with_bulk_job(self):
+        foo = Image.objects.create(title='foo')
+        bar = Image.objects.create(title='bar')
+        images = [{'title': 'foo changed', 'id': foo.id}, {'title': 'bar changed', 'id': bar.id}]
+        payload = self.bulk_payload(images)
+
+        with override_admin(Image, bulk_job_mode='thread', submit_bulk_job=lambda request, job: job()):
+            response = self.client.post(self.bulk_url, payload, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+            self.assertEqual(response.status_code, 202)
+
+            status_url = json.loads(response.content.decode('utf-8'))['status_url']
+            job = json.loads(self.client.get(status_url).content.decode('utf-8'))
+
+        self.assertEqual(job['status'], 'done')
+        self.assertEqual(job['processed'], 2)
+        self.assertEqual(job['redirect_url'], self.changelist_url)
+        self.assertImagesEqual(self.getTestQueryset().order_by('pk'), images)
+
+    def test_change_images_with_expired_bulk_job(self):
+        foo = Image.objects.create(title='foo')
+        payload = self.bulk_payload([{'title': 'foo changed', 'id': foo.id}])
+
+        with override_admin(Image, bulk_job_mode='thread', load_bulk_job=lambda request, job_id: None,
+                            submit_bulk_job=lambda request, job: job()):
+            response = self.client.post(self.bulk_url, payload, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+            status_response = self.client.get(json.loads(response.content.decode('utf-8'))['status_url'])
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(status_response.status_code, 404)
+        self.assertImagesEqual(self.getTestQueryset(), [foo])
+
+    def test_add_images_with_bulk_job_and_errors(self):
+        Image.objects.create(title='foo')
+
+        images = [{'title': 'bar'}, {'title': 'foo'}]
+        payload = self.bulk_payload(images, _addanother=1)
+
+        with override_admin(Image, bulk_job_mode='thread', submit_bulk_job=lambda request, job: job()):
+            response = self.client.post(self.bulk_url, payload, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+            status_url = json.loads(response.content.decode('utf-8'))['status_url']
+            job = json.loads(self.client.get(status_url).content.decode('utf-8'))
+
+            self.client.login(username='not_staff', password='not_staff')
+            self.user_not_staff.is_staff = True
+            self.user_not_staff.save()
+            other_user_response = self.client.get(status_url)
+
+        self.assertEqual(job['status'], 'invalid')
+        self.assertEqual([error['row'] for error in job['errors']], [1])
+        self.assertNotIn('redirect_url', job)
+        self.assertEqual(other_user_response.status_code, 404)
+        self.assertImagesEqual(self.getTestQueryset(), [{'title': 'foo'}])
+
+    def test_add_images_and_save_with_chunked_commits(self):
+        Image.objects.create(title='foo')
+
+        images = [{'title': 'bar'}, {'title': 'foo'}, {'title': 'baz'}, {'title': 'qux'}]
+        payload = self.bulk_payload(images)
+
+        with override_admin(Image, bulk_commit_mode='chunks', bulk_commit_chunk_size=2):
+            response = self.client.post(self.bulk_url, payload)
+
+        formset = response.context['inline_admin_formsets'][0].formset
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(formset.forms), 1)
+        self.assertIn('title', formset.forms[0].errors)
+        self.assertContains(response, 'Committed rows: 1, 3-4. Failed rows: 2.')
+        self.assertImagesEqual(self.getTestQueryset().order_by('pk'), [{'title': 'foo'}, {'title': 'bar'}, {'title': 'baz'}, {'title': 'qux'}])
+
+    def test_add_images_and_save_with_chunked_commits_and_formset_errors(self):
+        class ImageFormSet(BulkModelFormSet):
+            def clean(self):
+                raise ValidationError('Invalid formset')
+
+        class ImageInline(TabularBulkInlineModelAdmin):
+            formset = ImageFormSet
+
+        images = [{'title': 'foo'}, {'title': 'bar'}]
+        payload = self.bulk_payload(images)
+
+        with override_admin(Image, bulk_inline=ImageInline, bulk_commit_mode='chunks'):
+            response = self.client.post(self.bulk_url, payload)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Committed rows: -. Failed rows: 1, 2.')
+        self.assertFalse(Image.objects.exists())
+
+    def test_add_images_and_save_with_row_commits(self):
+        def save_formset(request, form, formset, change):
+            for obj in formset.save(commit=False):
+                if obj.title == 'fail':
+                    raise IntegrityError('Failing row')
+                obj.save()
+
+        images = [{'title': 'foo'}, {'title': 'fail'}, {'title': 'bar'}]
+        payload = self.bulk_payload(images)
+
+        with override_admin(Image, bulk_commit_mode='rows', save_formset=save_formset):
+            response = self.client.post(self.bulk_url, payload)
+
+        formset = response.context['inline_admin_formsets'][0].formset
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([form['title'].value() for form in formset.forms], ['fail'])
+        self.assertEqual([error.code for error in formset.forms[0].non_field_errors().as_data()], ['commit_error'])
+        self.assertImagesEqual(self.getTestQueryset().order_by('pk'), [{'title': 'foo'}, {'title': 'bar'}])
+
+    def test_add_image_and_save_with_validate_unique_in_bulk(self):
+        class ImageInline(TabularBulkInlineModelAdmin):
+            validate_unique_in_bulk = True
+
+        Image.objects.create(title='foo')
+
+        images = [{'title': 'foo'}, {'title': 'bar'}]
+        payload = self.bulk_payload(images)
+
+        with override_admin(Image, bulk_inline=ImageInline):
+            response = self.client.post(self.bulk_url, payload)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('title', response.context['inline_admin_formsets'][0].formset.errors[0])
+        self.assertEqual(response.context['inline_admin_formsets'][0].formset.errors[1], {})
+        self.assertImagesEqual(self.getTestQueryset(), [{'title': 'foo'}])
+
+    def test_add_duplicate_images_with_validate_unique_in_bulk(self):
+        class ImageInline(TabularBulkInlineModelAdmin):
+            validate_unique_in_bulk = True
+
+        images = [{'title': 'foo'}, {'title': 'foo'}]
+        payload = self.bulk_payload(images)
+
+        with override_admin(Image, bulk_inline=ImageInline):
+            response = self.client.post(self.bulk_url, payload)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['inline_admin_formsets'][0].formset.non_form_errors())
+        self.assertImagesEqual(self.getTestQueryset(), [])
+
+    def test_change_image_and_save_with_validate_unique_in_bulk(self):
+        class ImageInline(TabularBulkInlineModelAdmin):
+            validate_unique_in_bulk = True
+
+        foo = Image.objects.create(title='foo')
+        bar = Image.objects.create(title='bar')
+        images = [{'title': 'foo', 'id': foo.id}, {'title': 'baz', 'id': bar.id}]
+        payload = self.bulk_payload(images)
+
+        with override_admin(Image, bulk_inline=ImageInline):
+            response = self.client.post(self.bulk_url, payload)
+
+        self.assertRedirects(response, self.changelist_url)
+        self.assertImagesEqual(self.getTestQueryset().order_by('pk'), images)
+
+    def test_delete_protected_images_and_save(self):
+        foo = Image.objects.create(title='foo')
+        bar = Image.objects.create(title='bar')
+        baz = Image.objects.create(title='baz')
+        Project.objects.create(title='project', cover=bar)
+        images = [
+            {'title': foo.title, 'id': foo.id, 'DELETE': True},
+            {'title': bar.title, 'id': bar.id, 'DELETE': True},
+            {'title': baz.title, 'id': baz.id, 'DELETE': True},
+        ]
+        payload = self.bulk_payload(images)
+        response = self.client.post(self.bulk_url, payload)
+        formset = response.context['inline_admin_formsets'][0].formset
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([error.code for error in formset.non_form_errors().as_data()], ['deleting_protected'])
+        self.assertFalse(formset.forms[0].errors)
+        self.assertTrue(formset.forms[1].errors)
+        self.assertNotIn('protected related objects: ', formset.non_form_errors().as_text())
+        self.assertImagesEqual(self.getTestQueryset().order_by('pk'), [foo, bar, baz])
+
+    def test_formset_cache(self):
+        class ImageInline(TabularBulkInlineModelAdmin):
+            formset_cache_size = 10
+
+        with override_admin(Image, bulk_inline=ImageInline):
+            first = self.client.get(self.bulk_url).context['inline_admin_formsets'][0].formset.__class__
+            second = self.client.get(self.bulk_url).context['inline_admin_formsets'][0].formset.__class__
+
+            self.user.user_permissions.remove(self.add_permission)
+            without_add_permission = self.client.get(self.bulk_url).context['inline_admin_formsets'][0].formset.__class__
+
+            ImageInline.clear_formset_cache()
+            self.user.user_permissions.add(self.add_permission)
+            third = self.client.get(self.bulk_url).context['inline_admin_formsets'][0].formset.__class__
+
+        self.assertIs(first, second)
+        self.assertIsNot(first, without_add_permission)
+        self.assertEqual(without_add_permission.max_num, 0)
+        self.assertNotEqual(first.max_num, 0)
+        self.assertIsNot(first, third)
+
+    def test_formset_cache_with_formfield_for_dbfield(self):
+        class ImageInline(TabularBulkInlineModelAdmin):
+            formset_cache_size = 10
+
+            def formfield_for_dbfield(self, db_field, **kwargs):
+                return super(ImageInline, self).formfield_for_dbfield(db_field, **kwargs)
+
+        class CachedImageInline(ImageInline):
+            def get_formset_cache_key(self, request, obj=None):
+                return super(CachedImageInline, self).get_formset_cache_key(request, obj)
+
+        with override_admin(Image, bulk_inline=ImageInline):
+            first = self.client.get(self.bulk_url).context['inline_admin_formsets'][0].formset.__class__
+            second = self.client.get(self.bulk_url).context['inline_admin_formsets'][0].formset.__class__
+
+        with override_admin(Image, bulk_inline=CachedImageInline):
+            third = self.client.get(self.bulk_url).context['inline_admin_formsets'][0].formset.__class__
+            fourth = self.client.get(self.bulk_url).context['inline_admin_formsets'][0].formset.__class__
+
+        self.assertIsNot(first, second)
+        self.assertIs(third, fourth)
+
+    def test_change_projects_and_save_with_shared_choices(self):
+        class ProjectInline(TabularBulkInlineModelAdmin):
+            share_choices = True
+
+        images = [Image.objects.create(title='image {}'.format(index)) for index in range(3)]
+        projects = [Project.objects.create(title='project {}'.format(index)) for index in range(3)]
+        payload = self.bulk_payload([
+            {'id': project.id, 'title': project.title, 'cover': images[index].id, 'images': [image.id for image in images]}
+            for index, project in enumerate(projects)
+        ])
+        project_bulk_url = reverse('admin:{}_{}_bulk'.format(Project._meta.app_label, Project._meta.model_name))
+        project_changelist_url = reverse('admin:{}_{}_changelist'.format(Project._meta.app_label, Project._meta.model_name))
+        self.user.is_superuser = True
+        self.user.save()
+
+        with override_admin(Project, bulk_inline=ProjectInline):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(project_bulk_url, payload)
+
+        # Loading the choices of cover and images, instead of one query per form and field
+        image_queries = [query for query in queries.captured_queries if 'SELECT "example_project_image"."id", "example_project_image"."title"' in query['sql']]
+
+        self.assertRedirects(response, project_changelist_url)
+        self.assertEqual(len(image_queries), 2)
+        self.assertEqual([project.cover for project in Project.objects.order_by('pk')], images)
+        self.assertEqual(list(projects[0].images.order_by('pk')), images)
+
+    def test_http_get_bulk_with_client_shared_choices(self):
+        class ProjectInline(TabularBulkInlineModelAdmin):
+            share_choices = 'client'
+
+        images = [Image.objects.create(title='image {}'.format(index)) for index in range(3)]
+        project = Project.objects.create(title='project', cover=images[1])
+        project_bulk_url = reverse('admin:{}_{}_bulk'.format(Project._meta.app_label, Project._meta.model_name))
+        self.user.is_superuser = True
+        self.user.save()
+
+        with override_admin(Project, bulk_inline=ProjectInline):
+            response = self.client.get('{}?pks={}'.format(project_bulk_url, project.pk))
+
+        cover_choices = [value for value, label in response.context['inline_admin_formsets'][0].formset.forms[0].fields['cover'].choices]
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(cover_choices, ['', images[1].pk])
+        self.assertContains(response, 'id="bulk-shared-choices"')
+        self.assertContains(response, 'data-bulk-choices="cover"')
+
+    def test_http_get_bulk_with_related_lookups(self):
+        class ProjectInline(TabularBulkInlineModelAdmin):
+            raw_id_fields = ('images',)
+            readonly_fields = ('cover',)
+
+        images = [Image.objects.create(title='image {}'.format(index)) for index in range(3)]
+        projects = [Project.objects.create(title='project {}'.format(index), cover=images[index]) for index in range(3)]
+        project_bulk_url = reverse('admin:{}_{}_bulk'.format(Project._meta.app_label, Project._meta.model_name))
+        self.user.is_superuser = True
+        self.user.save()
+
+        for project in projects:
+            project.images.add(*images)
+
+        query_counts = []
+
+        with override_admin(Project, bulk_inline=ProjectInline):
+            for size in (1, 3):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get('{}?pks={}'.format(project_bulk_url, ','.join(str(project.pk) for project in projects[:size])))
+
+                self.assertEqual(response.status_code, 200)
+                query_counts.append(len(queries.captured_queries))
+
+        # The covers are selected and the images prefetched for all rows at once
+        self.assertEqual(query_counts[0], query_counts[1])
+        self.assertContains(response, 'image 2')
+
+    def test_transform_post_and_files_without_copies(self):
+        with BytesIO(b'data1') as data1:
+            data1.name = 'data1.txt'
+            request = RequestFactory().post(self.bulk_url, self.bulk_upload_payload('data', [data1]))
+
+        post, files, force_continue = admin_site._registry[Image].transform_post_and_files(request, 'form')
+
+        self.assertTrue(force_continue)
+        self.assertEqual(post['form-TOTAL_FORMS'], '1')
+        self.assertEqual(len(post.getlist('form-0-title')), 1)
+        self.assertEqual(files['form-0-data'].name, 'data1.txt')
+        self.assertNotIn('form-0-title', request.POST)
+        self.assertNotIn('form-0-data', request.FILES)
+
+        with self.assertRaises(AttributeError):
+            post['form-0-title'] = 'foo'
+
     def test_bulk_upload(self):
         with BytesIO(b'data1') as data1, BytesIO(b'data2') as data2:
             # Django < 1.8 requires *name* attribute
@@ -276,6 +1134,269 @@ class BulkTests(TestCase):
                 with image.data as image_data:
                     self.assertEqual(image_data.read(), data.getvalue())
 
+    def test_bulk_upload_with_data_workers(self):
+        last_generated = threading.Event()
+
+        def generate_data_for_file(request, field_name, field_file, index):
+            # The first files are only done after the last one, which needs the files to be processed in parallel
+            if index == 2:
+                last_generated.set()
+            elif not last_generated.wait(5):
+                raise AssertionError('The files were not processed in parallel')
+            return {'title': 'file {}'.format(index)}
+
+        files = [BytesIO(b'data') for index in range(3)]
+
+        for index, data in enumerate(files):
+            data.name = 'data{}.txt'.format(index)
+
+        payload = self.bulk_upload_payload('data', files)
+
+        with override_admin(Image, bulk_upload_data_workers=3, generate_data_for_file=generate_data_for_file):
+            response = self.client.post(self.bulk_url, payload)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([image.title for image in Image.objects.order_by('pk')], ['file 0', 'file 1', 'file 2'])
+
+        for image in Image.objects.all():
+            image.data.delete(save=False)
+
+    def test_bulk_upload_with_data_timeout(self):
+        released = threading.Event()
+
+        def generate_data_for_file(request, field_name, field_file, index):
+            if index == 1:
+                released.wait(5)
+            return {'title': 'file {}'.format(index)}
+
+        files = [BytesIO(b'data') for index in range(2)]
+
+        for index, data in enumerate(files):
+            data.name = 'data{}.txt'.format(index)
+
+        payload = self.bulk_upload_payload('data', files)
+
+        try:
+            with override_admin(Image, bulk_upload_data_workers=2, bulk_upload_data_timeout=0.1, generate_data_for_file=generate_data_for_file):
+                response = self.client.post(self.bulk_url, payload)
+        finally:
+            released.set()
+
+        formset = response.context['inline_admin_formsets'][0].formset
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([bool(form.errors) for form in formset.forms], [False, True])
+        self.assertEqual([error.code for error in formset.forms[1].non_field_errors().as_data()], ['pending_file'])
+        self.assertFalse(Image.objects.exists())
+
+    def test_bulk_upload_with_data_timeout_per_file(self):
+        def generate_data_for_file(request, field_name, field_file, index):
+            time.sleep(0.3)
+            return {'title': 'file {}'.format(index)}
+
+        files = [BytesIO(b'data') for index in range(2)]
+
+        for index, data in enumerate(files):
+            data.name = 'data{}.txt'.format(index)
+
+        payload = self.bulk_upload_payload('data', files)
+
+        # The second file waits for the only thread, which doesn't count towards its timeout
+        with override_admin(Image, bulk_upload_data_workers=1, bulk_upload_data_timeout=0.5, generate_data_for_file=generate_data_for_file):
+            response = self.client.post(self.bulk_url, payload)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([image.title for image in Image.objects.order_by('pk')], ['file 0', 'file 1'])
+
+        for image in Image.objects.all():
+            image.data.delete(save=False)
+
+    def test_bulk_upload_with_storage_workers(self):
+        with BytesIO(b'data1') as data1, BytesIO(b'data2') as data2:
+            data1.name = 'data1.txt'
+            data2.name = 'data2.txt'
+
+            payload = self.bulk_upload_payload('data', [data1, data2])
+
+            with override_admin(Image, bulk_upload_storage_workers=2):
+                response = self.client.post(self.bulk_url, payload)
+
+            images = list(Image.objects.order_by('pk'))
+
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(images), 2)
+
+            for image, data in zip(images, [data1, data2]):
+                with image.data as image_data:
+                    self.assertEqual(image_data.read(), data.getvalue())
+
+    def test_bulk_upload_with_storage_workers_and_failing_storage(self):
+        field = Image._meta.get_field('data')
+        storage = field.storage
+
+        class FailingStorage(storage.__class__):
+            def _save(self, name, content):
+                if 'fail' in name:
+                    raise IOError('Storage unavailable')
+                return super(FailingStorage, self)._save(name, content)
+
+        with BytesIO(b'data1') as data1, BytesIO(b'data2') as data2:
+            data1.name = 'written.txt'
+            data2.name = 'fail.txt'
+
+            payload = self.bulk_upload_payload('data', [data1, data2])
+            field.storage = FailingStorage()
+
+            try:
+                with override_admin(Image, bulk_upload_storage_workers=2):
+                    response = self.client.post(self.bulk_url, payload)
+            finally:
+                field.storage = storage
+
+        formset = response.context['inline_admin_formsets'][0].formset
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(formset.forms[0].errors)
+        self.assertIn('data', formset.forms[1].errors)
+        self.assertFalse(Image.objects.exists())
+        self.assertFalse(storage.exists('written.txt'))
+
+    def test_bulk_upload_chunked(self):
+        upload_url = '{}?upload_id={}&field=data&name=data.txt&size=10'.format(self.bulk_upload_url, 'a' * 32)
+
+        response = self.client.post('{}&offset=0'.format(upload_url), b'data1', content_type='application/octet-stream')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content.decode('utf-8')), {'offset': 5})
+
+        response = self.client.post('{}&offset=0'.format(upload_url), b'data1', content_type='application/octet-stream')
+        self.assertEqual(response.status_code, 409)
+
+        response = self.client.get(upload_url)
+        self.assertEqual(json.loads(response.content.decode('utf-8')), {'offset': 5})
+
+        response = self.client.post('{}&offset=5'.format(upload_url), b'data2', content_type='application/octet-stream')
+        self.assertEqual(response.status_code, 200)
+
+        image = Image.objects.get()
+        self.assertEqual(json.loads(response.content.decode('utf-8')), {'offset': 10, 'pk': str(image.pk)})
+
+        with image.data as image_data:
+            self.assertEqual(image_data.read(), b'data1data2')
+
+    def test_bulk_upload_chunked_with_log_entry(self):
+        upload_url = '{}?upload_id={}&field=data&name=data.txt&size=5&offset=0'.format(self.bulk_upload_url, 'a' * 32)
+        response = self.client.post(upload_url, b'data1', content_type='application/octet-stream')
+
+        image = Image.objects.get()
+        image.data.delete(save=False)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(entry.object_id, entry.action_flag) for entry in LogEntry.objects.all()], [(str(image.pk), ADDITION)])
+
+    def test_bulk_upload_chunked_finish(self):
+        foo = Image.objects.create(title='foo')
+        bar = Image.objects.create(title='bar')
+        self.user.user_permissions.add(self.change_permission)
+
+        response = self.client.post('{}?finish=1'.format(self.bulk_upload_url), {'pks': [foo.pk, bar.pk]})
+        selection = json.loads(response.content.decode('utf-8'))['selection']
+        response = self.client.get('{}?selection={}'.format(self.bulk_url, selection))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertImagesEqual(self.getResponseQueryset(response).order_by('pk'), [foo, bar])
+
+    def test_bulk_upload_chunked_with_invalid_parameters(self):
+        upload_url = '{}?upload_id={}&field=data&name=data.txt'.format(self.bulk_upload_url, 'a' * 32)
+
+        invalid_index = self.client.post('{}&size=5&offset=0&index=foo'.format(upload_url), b'data1', content_type='application/octet-stream')
+        invalid_offset = self.client.post('{}&size=5&offset=foo'.format(upload_url), b'data1', content_type='application/octet-stream')
+
+        with override_admin(Image, bulk_upload_max_size=4):
+            too_large = self.client.post('{}&size=5&offset=0'.format(upload_url), b'data1', content_type='application/octet-stream')
+
+        self.assertEqual(invalid_index.status_code, 400)
+        self.assertEqual(invalid_offset.status_code, 400)
+        self.assertEqual(too_large.status_code, 413)
+        self.assertFalse(Image.objects.exists())
+
+    def test_bulk_upload_chunked_deletes_expired_uploads(self):
+        model_admin = admin_site._registry[Image]
+        upload_url = '{}?upload_id={}&field=data&name=data.txt&size=10&offset=0'.format(self.bulk_upload_url, 'b' * 32)
+        request = RequestFactory().get(upload_url)
+        request.user = self.user
+        expired_path = model_admin.get_bulk_upload_temporary_path(request, 'c' * 32)
+
+        with open(expired_path, 'wb') as expired_file:
+            expired_file.write(b'data1')
+
+        os.utime(expired_path, (0, 0))
+        response = self.client.post(upload_url, b'data1', content_type='application/octet-stream')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(os.path.exists(expired_path))
+        self.assertTrue(os.path.exists(model_admin.get_bulk_upload_temporary_path(request, 'b' * 32)))
+
+        os.remove(model_admin.get_bulk_upload_temporary_path(request, 'b' * 32))
+
+    def test_bulk_upload_chunked_without_add_permission(self):
+        self.user.user_permissions.remove(self.add_permission)
+
+        upload_url = '{}?upload_id={}&field=data&name=data.txt&size=5&offset=0'.format(self.bulk_upload_url, 'a' * 32)
+        response = self.client.post(upload_url, b'data1', content_type='application/octet-stream')
+
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Image.objects.exists())
+
+    def test_bulk_import_csv(self):
+        body = 'title\nfoo\nbar\nbaz\n'.encode('utf-8')
+
+        with override_admin(Image, bulk_import_batch_size=2):
+            response = self.client.post(self.bulk_import_url, body, content_type='text/csv')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content.decode('utf-8')), {'created': 3, 'errors': [], 'failed_batches': []})
+        self.assertImagesEqual(self.getTestQueryset().order_by('pk'), [{'title': 'foo'}, {'title': 'bar'}, {'title': 'baz'}])
+
+    def test_bulk_import_csv_with_many_to_many(self):
+        images = [Image.objects.create(title='image {}'.format(index)) for index in range(2)]
+        body = 'title,images\nfoo,"{},{}"\nbar,\n'.format(images[0].pk, images[1].pk).encode('utf-8')
+        project_import_url = reverse('admin:{}_{}_bulk_import'.format(Project._meta.app_label, Project._meta.model_name))
+        self.user.is_superuser = True
+        self.user.save()
+
+        with override_admin(Project, bulk_inline=TabularBulkInlineModelAdmin):
+            response = self.client.post(project_import_url, body, content_type='text/csv')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content.decode('utf-8'))['created'], 2)
+        self.assertEqual(list(Project.objects.get(title='foo').images.order_by('pk')), images)
+        self.assertFalse(Project.objects.get(title='bar').images.exists())
+
+    def test_bulk_import_json_lines_with_errors(self):
+        Image.objects.create(title='bar')
+
+        body = '\n'.join(json.dumps({'title': title}) for title in ['foo', 'bar', 'baz']).encode('utf-8')
+
+        with override_admin(Image, bulk_import_batch_size=2):
+            response = self.client.post(self.bulk_import_url, body, content_type='application/x-ndjson')
+
+        report = json.loads(response.content.decode('utf-8'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(report['created'], 1)
+        self.assertEqual([error['row'] for error in report['errors']], [2])
+        self.assertIn('title', report['errors'][0]['errors'])
+        self.assertEqual(report['failed_batches'], [{'first_row': 1, 'last_row': 2, 'errors': []}])
+        self.assertImagesEqual(self.getTestQueryset().order_by('pk'), [{'title': 'bar'}, {'title': 'baz'}])
+
+    def test_bulk_import_without_add_permission(self):
+        self.user.user_permissions.remove(self.add_permission)
+
+        response = self.client.post(self.bulk_import_url, b'title\nfoo\n', content_type='text/csv')
+
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Image.objects.exists())
+
     def test_bulk_inline_model_admin_without_model(self):
         class ImageInline(BulkInlineModelAdmin):
             pass
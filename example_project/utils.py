@@ -0,0 +1,28 @@
+from __future__ import unicode_literals
+
+from contextlib import contextmanager
+from django.contrib.admin.sites import site as admin_site
+from django.utils import six
+
+
+@contextmanager
+def override_admin(model, **attrs):
+    """
+    Sets the *attrs* on the registered admin of *model* and restores them
+    afterwards.
+    """
+    model_admin = admin_site._registry[model]
+    missing = object()
+    originals = {name: model_admin.__dict__.get(name, missing) for name in attrs}
+
+    for name, value in six.iteritems(attrs):
+        setattr(model_admin, name, value)
+
+    try:
+        yield model_admin
+    finally:
+        for name, value in six.iteritems(originals):
+            if value is missing:
+                delattr(model_admin, name)
+            else:
+                setattr(model_admin, name, value)